@@ -10,7 +10,7 @@ a = Analysis(['src/main.py'],
              hiddenimports=[],
              hookspath=[],
              runtime_hooks=[],
-             excludes=['matplotlib'],
+             excludes=['matplotlib', 'pandas'],
              win_no_prefer_redirects=False,
              win_private_assemblies=False,
              cipher=block_cipher,
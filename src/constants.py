@@ -1,7 +1,13 @@
 SKIN_DIRECTORY = "./ppvs2_skins/"
+SKIN_CACHE_SIZE = 4
+PIXMAP_CACHE_SIZE = 512
 MODULE_DIRECTORY = "./modules/"
+EXPORT_DIRECTORY = "./export/"
+STARTUP_LOG = "./startup_profile.csv"
+RESULTS_FILE = "./results.db"
 METADATA_FILE = "/metadata.yml"
 SELFCOMPAT_FILE = "/selfcompat.txt"
+VALIDATION_FILE = "/validation.db"
 PUZZLE_FILE_ROOT = "puzzle_"
 PUZZLE_FILE_EXT = ".yml"
 MODULE_PARAMETERS = {
@@ -19,3 +25,9 @@ MODULE_DEFAULTS = {
     "pop_limit": 4,
 }
 POP_SPEED = 0.2
+INPUT_TICK = 0.016
+DRAWPILE_VISIBLE = 2
+TEST_PREFETCH = 2
+SAMPLE_FAIL_WEIGHT = 2.0
+WATCH_DEBOUNCE = 0.25
+MEMORY_REFRESH = 5.0
@@ -0,0 +1,149 @@
+"""
+Headless export of every puzzle in a module: a PNG review sheet of the board
+before and after each move, and optionally a GIF animation of the solution
+including each step of every chain. Puzzles are rendered across a process
+pool; the skin's tile table is placed in shared memory once and attached
+read-only by every worker.
+
+Usage: python src/export.py MODULE [--skin SKIN] [--gif] [--workers N]
+"""
+
+from models import PuzzleModule, Puzzle
+from models.graphic import skin_tiles, TileTable
+from models.render import solution_frames, frame2image, sheet2image
+from constants import EXPORT_DIRECTORY, POP_SPEED, PUZZLE_FILE_EXT
+from multiprocessing import shared_memory
+import multiprocessing as mp
+import numpy as np
+import argparse
+import time
+import sys
+import cv2
+import os
+
+# Resting frames are held for this many pop animation steps in the GIF.
+REST_STEPS = 4
+
+# Workers rebuild a (rule-free) module from its metadata to parse puzzles.
+METADATA_KEYS = [
+    "board_shape",
+    "board_nhide",
+    "move_shape",
+    "color_limit",
+    "pop_limit",
+    "modulereadme",
+]
+
+_worker = {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the puzzles of a module.")
+    parser.add_argument("module", help="name of the module to export")
+    parser.add_argument("--skin", default="Aqua.png", help="skin file to render with")
+    parser.add_argument("--out", help="output directory (default: export/MODULE)")
+    parser.add_argument("--gif", action="store_true", help="also write animations")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    outdir = args.out if args.out else EXPORT_DIRECTORY + args.module
+    os.makedirs(outdir, exist_ok=True)
+
+    start = time.perf_counter()
+    count = export_module(args.module, args.skin, outdir, args.gif, args.workers)
+    elapsed = time.perf_counter() - start
+    print("Exported {} puzzles in {:.1f}s.".format(count, elapsed))
+
+
+def export_module(modulename, skin, outdir, gif=False, workers=None):
+    """
+    Export every valid puzzle of the module; puzzle files which fail to load
+    are skipped and reported. Return the number exported.
+    """
+    module, invalid = PuzzleModule.load_partial(modulename)
+    if invalid:
+        print("Skipped invalid puzzles:", ", ".join(sorted(invalid)), file=sys.stderr)
+    metadata = {key: getattr(module, key) for key in METADATA_KEYS}
+    filenames = sorted([name + PUZZLE_FILE_EXT for name in module.puzzles])
+
+    table = skin_tiles(skin)
+    shm = shared_memory.SharedMemory(create=True, size=table.images.nbytes)
+    images = np.ndarray(table.images.shape, table.images.dtype, buffer=shm.buf)
+    images[:] = table.images
+    try:
+        initargs = (
+            shm.name,
+            table.images.shape,
+            table.images.dtype.str,
+            table.lut,
+            modulename,
+            metadata,
+            outdir,
+            gif,
+        )
+
+        with mp.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            for count, _ in enumerate(pool.imap_unordered(_export_puzzle, filenames)):
+                print("\r{}/{}".format(count + 1, len(filenames)), end="", flush=True)
+        print()
+
+    finally:
+        del images
+        shm.close()
+        shm.unlink()
+
+    return len(filenames)
+
+
+def _init_worker(shm_name, shape, dtype, lut, modulename, metadata, outdir, gif):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    images = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+    images.setflags(write=False)
+
+    _worker["shm"] = shm
+    _worker["table"] = TileTable(images, lut)
+    _worker["modulename"] = modulename
+    _worker["module"] = PuzzleModule(**metadata)
+    _worker["outdir"] = outdir
+    _worker["gif"] = gif
+
+
+def _export_puzzle(filename):
+    table = _worker["table"]
+    puzzle = Puzzle.load(filename, _worker["modulename"], _worker["module"])
+    name = os.path.splitext(filename)[0]
+    outpath = os.path.join(_worker["outdir"], name)
+
+    timeline = solution_frames(puzzle)
+    sheet = sheet2image(
+        [frame2image(table, frames[-1]) for frames in timeline],
+        ["Start"] + ["Move " + str(i) for i in range(1, len(timeline))],
+    )
+    cv2.imwrite(outpath + ".png", cv2.cvtColor(sheet, cv2.COLOR_RGB2BGR))
+
+    if _worker["gif"]:
+        images, steps = [], []
+        for frames in timeline:
+            images += [frame2image(table, frame) for frame in frames]
+            steps += [1] * (len(frames) - 1) + [REST_STEPS]
+        _write_gif(outpath + ".gif", images, steps)
+
+    return filename
+
+
+def _write_gif(filepath, images, steps):
+    # Pillow is only needed for animations, so it is imported on demand.
+    from PIL import Image
+
+    frames = [Image.fromarray(image) for image in images]
+    frames[0].save(
+        filepath,
+        save_all=True,
+        append_images=frames[1:],
+        duration=[int(step * POP_SPEED * 1000) for step in steps],
+        loop=0,
+    )
+
+
+if __name__ == "__main__":
+    main()
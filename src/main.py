@@ -1,11 +1,43 @@
-from PyQt5.QtWidgets import QApplication
-from viewcontrols import MainControl
+from profiling import PhaseTimer
+import argparse
 import sys
 
 
+def load_app():
+    """
+    Import Qt and the application controllers. These are imported once the
+    profiler has started, so that the time they take is measured.
+    """
+    from PyQt5.QtWidgets import QApplication
+    from viewcontrols import MainControl
+
+    return QApplication, MainControl
+
+
 def main():
+    profiler = PhaseTimer()
+    parser = argparse.ArgumentParser(description="Puyo puzzle trainer.")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="print (and log) the time taken by each phase of startup",
+    )
+    args = parser.parse_args()
+    QApplication, MainControl = load_app()
+    profiler.mark("imports")
+
     app = QApplication([])
-    _ = MainControl()
+    profiler.mark("qt init")
+
+    _ = MainControl(profiler)
+
+    app.processEvents()
+    profiler.mark("first paint")
+
+    if args.startup_profile:
+        profiler.report()
+        profiler.log()
+
     sys.exit(app.exec_())
 
 
@@ -1,5 +1,7 @@
 from models.module import PuzzleModule
 from models.puzzle import Puzzle
+from models.directory import ModuleIndex
+from models.rules import RuleEvaluator, Violation, check_puzzle, check_puzzles
 from models.puyo import Puyo, Direc, PopState
 from models.grid import AbstractGrid, BoardGrid, MoveGrid, HoverGrid, Move
 from models.graphic import grid2graphics
@@ -0,0 +1,126 @@
+from collections import namedtuple
+from constants import MODULE_DIRECTORY, PUZZLE_FILE_ROOT, PUZZLE_FILE_EXT
+import bisect
+import os
+
+
+PuzzleFile = namedtuple("PuzzleFile", "mtime, size")
+
+
+class ModuleIndex:
+    """
+    A cached listing of the puzzle files within a module directory, including
+    their modification times and sizes and the next free puzzle file name.
+    Use **ModuleIndex.of** to share one index per module. The directory is
+    only rescanned if its own modification time has changed; saving a puzzle
+    should instead update the index incrementally with **add**.
+    """
+
+    _indices = {}
+
+    def __init__(self, modulename):
+        self.modulename = modulename
+        self.path = MODULE_DIRECTORY + modulename
+        self.files = {}
+        self._taken = set()
+        self._free = 0
+        self._names = None
+        self._dir_mtime = None
+        self.scan()
+
+    @staticmethod
+    def of(modulename):
+        """Return the shared index of the module (rescanned if stale)."""
+        index = ModuleIndex._indices.get(modulename)
+        if index is None:
+            index = ModuleIndex(modulename)
+            ModuleIndex._indices[modulename] = index
+        elif index._dir_mtime != os.stat(index.path).st_mtime_ns:
+            index.scan()
+
+        return index
+
+    @property
+    def filenames(self):
+        """[str]: Puzzle file names (unordered)."""
+        return list(self.files)
+
+    @property
+    def names(self):
+        """[str]: Sorted puzzle names (file names without extension)."""
+        if self._names is None:
+            self._names = sorted([os.path.splitext(f)[0] for f in self.files])
+        return self._names
+
+    def scan(self):
+        """
+        Rescan the module directory.
+
+        Returns:
+            (set, set, set): The added, removed, and modified puzzle file names.
+        """
+        files = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if not ModuleIndex.is_puzzle_file(entry.name):
+                    continue
+                elif not entry.is_file():
+                    continue
+                stat = entry.stat()
+                files[entry.name] = PuzzleFile(stat.st_mtime_ns, stat.st_size)
+
+        added = set(files) - set(self.files)
+        removed = set(self.files) - set(files)
+        modified = {
+            f for f in set(files) & set(self.files) if files[f] != self.files[f]
+        }
+
+        self.files = files
+        self._taken = {ModuleIndex._name2ind(f) for f in files} - {None}
+        self._free = 0
+        self._advance()
+        self._names = None
+        self._dir_mtime = os.stat(self.path).st_mtime_ns
+
+        return added, removed, modified
+
+    def next_name(self):
+        """Return the first free puzzle file name."""
+        return ModuleIndex._ind2name(self._free)
+
+    def add(self, filename):
+        """Record a puzzle file written to the module directory."""
+        stat = os.stat(self.path + "/" + filename)
+        if filename not in self.files and self._names is not None:
+            bisect.insort(self._names, os.path.splitext(filename)[0])
+        self.files[filename] = PuzzleFile(stat.st_mtime_ns, stat.st_size)
+
+        idx = ModuleIndex._name2ind(filename)
+        if idx is not None:
+            self._taken.add(idx)
+            self._advance()
+
+        self._dir_mtime = os.stat(self.path).st_mtime_ns
+
+    def _advance(self):
+        while self._free in self._taken:
+            self._free += 1
+
+    @staticmethod
+    def is_puzzle_file(filename):
+        return filename.startswith(PUZZLE_FILE_ROOT) and filename.endswith(
+            PUZZLE_FILE_EXT
+        )
+
+    @staticmethod
+    def _ind2name(idx):
+        return PUZZLE_FILE_ROOT + str(idx + 1) + PUZZLE_FILE_EXT
+
+    @staticmethod
+    def _name2ind(filename):
+        number = filename[len(PUZZLE_FILE_ROOT) : -len(PUZZLE_FILE_EXT)]
+        if not number.isdigit() or int(number) < 1:
+            return None
+        elif ModuleIndex._ind2name(int(number) - 1) != filename:
+            return None
+        return int(number) - 1
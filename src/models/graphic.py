@@ -1,109 +1,212 @@
-from collections import namedtuple, defaultdict
-from itertools import chain
+from collections import namedtuple, defaultdict, OrderedDict
+from itertools import product
 from models import Puyo, Direc, PopState
-from constants import SKIN_DIRECTORY
-import cv2
+from constants import SKIN_DIRECTORY, SKIN_CACHE_SIZE
+import numpy as np
+import os
+import time
 
 # This module is designed to work with 512x512px skin files from PPVS2.
 
 
 def grid2graphics(skin, grid, ghosts=set(), pops=set(), popstate=PopState.PREPOP):
-    # Load the skin file.
-    skin = cv2.imread(SKIN_DIRECTORY + skin, cv2.IMREAD_UNCHANGED)
-    skin = cv2.cvtColor(skin, cv2.COLOR_BGRA2RGBA)
-
-    # Accumulate the various graphics.
-    exclude = ghosts | pops if popstate is not PopState.PREPOP else ghosts
-    graphics = _grid2regulargfx(skin, grid, exclude)
-    graphics += _ghostgfx(skin, ghosts)
-    graphics += _popgfx(skin, pops, popstate) if popstate is not PopState.PREPOP else []
-    return graphics
-
-
-def _grid2regulargfx(skin, grid, exclude=set()):
-    graphics = []
-    for elem in grid:
-        if elem.pos in {x.pos for x in exclude}:
-            continue
-
-        adj_set = grid.adjacent(elem.pos)
-        adj_set = {adj for adj in adj_set if adj.puyo is elem.puyo}
-
-        north, south, east, west = (False, False, False, False)
-        if not grid.is_hidden(elem.pos):
-            for adj in adj_set:
-                if grid.is_hidden(adj.pos):
-                    continue
-                direc = Direc.adj_direc(elem.pos, adj.pos)
-                north = True if direc is Direc.NORTH else north
-                south = True if direc is Direc.SOUTH else south
-                east = True if direc is Direc.EAST else east
-                west = True if direc is Direc.WEST else west
-
-        if elem.puyo is Puyo.NONE:
-            px_col = NONE_COL
-        elif elem.puyo is Puyo.GARBAGE:
-            px_col = GARBAGE_COL
-        else:
-            px_col = SKIN_COL_MAP[AdjMatch(north, south, east, west)]
+    """Return the **Graphics** (skin and tile ids) of the grid."""
+    return Graphics(skin, grid2tiles(grid, ghosts, pops, popstate))
 
-        px_row = SKIN_ROW_MAP[elem.puyo]
-        image = skin[
-            px_row * SKIN_SIZE + 1 : (px_row + 1) * SKIN_SIZE - 1,
-            px_col * SKIN_SIZE + 1 : (px_col + 1) * SKIN_SIZE - 1,
-        ]
 
-        opacity = 0.5 if grid.is_hidden(elem.pos) else 1
-        graphics.append(Graphic(elem.pos, image, opacity))
+def grid2tiles(grid, ghosts=set(), pops=set(), popstate=PopState.PREPOP):
+    """
+    Return the tile id of every grid element (see **tile_id**). Tile ids are
+    independent of the skin.
 
-    return graphics
+    Args:
+        grid (AbstractGrid): The grid to render.
+        ghosts (set): Grid elements to render as ghosts.
+        pops (set): Grid elements to render at the given pop state.
+        popstate (PopState): Pop animation state.
+    """
+    codes = grid.codes
+    hidden = np.zeros(grid.shape, dtype=bool)
+    hidden[grid.shape[0] - grid.nhide :, :] = True
+    tiles = _tile_ids(codes, adjacency_masks(codes, grid.nhide), hidden)
 
+    if popstate is not PopState.PREPOP:
+        for elem in pops:
+            tiles[elem.pos] = tile_id(elem.puyo, popstate=popstate)
 
-def _ghostgfx(skin, ghosts):
-    graphics = []
     for elem in ghosts:
-        px_row, px_col = SKIN_GHOST_MAP[elem.puyo]
-        image = skin[
-            px_row * GHOST_SIZE + 1 : (px_row + 1) * GHOST_SIZE - 1,
-            px_col * GHOST_SIZE + 1 : (px_col + 1) * GHOST_SIZE - 1,
-        ]
+        tiles[elem.pos] = tile_id(elem.puyo, ghost=True)
+
+    return tiles
+
+
+def tile_id(puyo, adjmask=0, hidden=False, ghost=False, popstate=PopState.PREPOP):
+    """
+    Return the integer id of a tile, indexed by the puyo, the 4-bit mask of
+    same-colored adjacent puyos (see **ADJ_BITS**), whether it is in a hidden
+    row, whether it is a ghost, and its pop state.
+    """
+    return int(_tile_ids(puyo.value, adjmask, hidden, ghost, popstate.value))
+
+
+def adjacency_masks(codes, nhide):
+    """
+    Return the 4-bit mask of same-colored adjacent puyos (see **ADJ_BITS**)
+    of every element of a coded grid, found by comparing the grid to itself
+    shifted one row and one column. Hidden rows, empty cells, and garbage
+    have no adjacent puyos (they are drawn the same regardless).
+    """
+    visible = codes[: codes.shape[0] - nhide, :]
+    masks = np.zeros(codes.shape, dtype=np.int32)
+
+    vertical = visible[1:, :] == visible[:-1, :]
+    masks[: visible.shape[0] - 1, :] |= vertical * ADJ_BITS[Direc.NORTH]
+    masks[1 : visible.shape[0], :] |= vertical * ADJ_BITS[Direc.SOUTH]
+
+    horizontal = visible[:, 1:] == visible[:, :-1]
+    masks[: visible.shape[0], :-1] |= horizontal * ADJ_BITS[Direc.EAST]
+    masks[: visible.shape[0], 1:] |= horizontal * ADJ_BITS[Direc.WEST]
+
+    masks[~IS_COLOR[codes]] = 0
+    return masks
+
+
+def skin_tiles(skin):
+    """Return the precompiled **TileTable** of the skin (cached with the skin)."""
+    atlas = skin_atlas(skin)
+    cached = _skin_cache[skin]
+    if cached.tiles is None:
+        cached = cached._replace(tiles=_build_tiles(atlas))
+        _skin_cache[skin] = cached
+
+    return cached.tiles
+
+
+def skin_atlas(skin):
+    """
+    Return the decoded (read-only, RGBA) image of the skin file. Skins are
+    cached process-wide, least recently used first out, and reloaded if the
+    skin file has been modified.
+    """
+    filepath = SKIN_DIRECTORY + skin
+    mtime = os.stat(filepath).st_mtime_ns
 
-        padsize = int((SKIN_SIZE - GHOST_SIZE) / 2)
-        image = cv2.copyMakeBorder(
-            image, padsize, padsize, padsize, padsize, cv2.BORDER_CONSTANT
-        )
+    cached = _skin_cache.get(skin)
+    if cached is not None and cached.mtime == mtime:
+        _skin_cache.move_to_end(skin)
+        _skin_stats["hits"] += 1
+        return cached.atlas
 
-        graphics.append(Graphic(elem.pos, image, 1))
+    # OpenCV is slow to import, so it is not loaded until a skin is decoded.
+    import cv2
 
-    return graphics
+    start = time.perf_counter()
+    atlas = cv2.imread(filepath, cv2.IMREAD_UNCHANGED)
+    atlas = cv2.cvtColor(atlas, cv2.COLOR_BGRA2RGBA)
+    atlas.setflags(write=False)
+    _skin_stats["misses"] += 1
+    _skin_stats["load_time"] += time.perf_counter() - start
 
+    _skin_cache[skin] = SkinEntry(mtime, atlas, None)
+    _skin_cache.move_to_end(skin)
+    while len(_skin_cache) > SKIN_CACHE_SIZE:
+        _skin_cache.popitem(last=False)
 
-def _popgfx(skin, pops, popstate):
-    graphics = []
-    for elem in pops:
-        if elem.puyo is Puyo.GARBAGE:
-            if popstate is PopState.POPEARLY:
-                px_col = GARBAGE_COL
-                px_row = SKIN_ROW_MAP[Puyo.GARBAGE]
-            else:
-                px_col = NONE_COL
-                px_row = SKIN_ROW_MAP[Puyo.NONE]
+    return atlas
+
+
+def skin_cache_info():
+    """Return the skin cache hits, misses, and total load (read and decode) time."""
+    return SkinCacheInfo(**_skin_stats)
+
+
+def _tile_ids(codes, adjmask, hidden, ghost=False, popvalue=PopState.PREPOP.value):
+    """Vectorized form of **tile_id** over coded puyo and pop state values."""
+    tiles = (np.asarray(codes, dtype=np.int32) - 1) * 16 + adjmask
+    tiles = tiles * 2 + np.asarray(hidden, dtype=np.int32)
+    tiles = tiles * 2 + np.asarray(ghost, dtype=np.int32)
+    return tiles * len(PopState) + popvalue - 1
+
+
+def _build_tiles(atlas):
+    """Slice every tile out of the skin once, sharing identical tiles."""
+    images, sources = [], {}
+    lut = np.empty(len(Puyo) * 16 * 2 * 2 * len(PopState), dtype=np.int32)
+    keys = product(Puyo, range(16), (False, True), (False, True), PopState)
+    for key in keys:
+        source = _tile_source(*key)
+        if source not in sources:
+            sources[source] = len(images)
+            images.append(_slice_tile(atlas, *source))
+        lut[tile_id(*key)] = sources[source]
+
+    images = np.array(images)
+    images.setflags(write=False)
+    lut.setflags(write=False)
+    return TileTable(images, lut)
+
+
+def _tile_source(puyo, adjmask, hidden, ghost, popstate):
+    """Return the tile size, skin row and column, and opacity of a tile."""
+    if ghost and Puyo.is_color(puyo):
+        px_row, px_col = SKIN_GHOST_MAP[puyo]
+        return GHOST_SIZE, px_row, px_col, 1
+    elif popstate is not PopState.PREPOP and puyo is Puyo.GARBAGE:
+        if popstate is PopState.POPEARLY:
+            return SKIN_SIZE, SKIN_ROW_MAP[Puyo.GARBAGE], GARBAGE_COL, 1
         else:
-            px_col = SKIN_POPMAP[elem.puyo]
-            px_col = px_col + 1 if popstate is PopState.POPLATER else px_col
-            px_row = SKIN_POPMAP_ROW
+            return SKIN_SIZE, SKIN_ROW_MAP[Puyo.NONE], NONE_COL, 1
+    elif popstate is not PopState.PREPOP and Puyo.is_color(puyo):
+        px_col = SKIN_POPMAP[puyo]
+        px_col = px_col + 1 if popstate is PopState.POPLATER else px_col
+        return SKIN_SIZE, SKIN_POPMAP_ROW, px_col, 1
 
-        image = skin[
-            px_row * SKIN_SIZE + 1 : (px_row + 1) * SKIN_SIZE - 1,
-            px_col * SKIN_SIZE + 1 : (px_col + 1) * SKIN_SIZE - 1,
+    if puyo is Puyo.NONE:
+        px_col = NONE_COL
+    elif puyo is Puyo.GARBAGE:
+        px_col = GARBAGE_COL
+    else:
+        px_col = SKIN_COL_MAP[
+            AdjMatch(
+                north=bool(adjmask & ADJ_BITS[Direc.NORTH]),
+                south=bool(adjmask & ADJ_BITS[Direc.SOUTH]),
+                east=bool(adjmask & ADJ_BITS[Direc.EAST]),
+                west=bool(adjmask & ADJ_BITS[Direc.WEST]),
+            )
         ]
-        graphics.append(Graphic(elem.pos, image, 1))
 
-    return graphics
+    opacity = 0.5 if hidden else 1
+    return SKIN_SIZE, SKIN_ROW_MAP[puyo], px_col, opacity
+
+
+def _slice_tile(atlas, size, px_row, px_col, opacity):
+    image = atlas[
+        px_row * size + 1 : (px_row + 1) * size - 1,
+        px_col * size + 1 : (px_col + 1) * size - 1,
+    ].copy()
+
+    # Ghosts are padded out to the full tile size.
+    padsize = int((SKIN_SIZE - size) / 2)
+    image = np.pad(image, ((padsize, padsize), (padsize, padsize), (0, 0)))
 
+    # Opacity is baked into the alpha channel.
+    image[:, :, 3] = (image[:, :, 3] * opacity).astype(np.uint8)
+    return image
 
-Graphic = namedtuple("Graphic", "pos, image, opacity")
+
+Graphics = namedtuple("Graphics", "skin, tiles")
 AdjMatch = namedtuple("AdjMatch", "north, south, east, west")
+TileTable = namedtuple("TileTable", "images, lut")
+SkinEntry = namedtuple("SkinEntry", "mtime, atlas, tiles")
+SkinCacheInfo = namedtuple("SkinCacheInfo", "hits, misses, load_time")
+
+_skin_cache = OrderedDict()
+_skin_stats = {"hits": 0, "misses": 0, "load_time": 0.0}
+
+ADJ_BITS = {Direc.SOUTH: 1, Direc.NORTH: 2, Direc.EAST: 4, Direc.WEST: 8}
+IS_COLOR = np.zeros(max([puyo.value for puyo in Puyo]) + 1, dtype=bool)
+for puyo in Puyo:
+    IS_COLOR[puyo.value] = Puyo.is_color(puyo)
 
 SKIN_SIZE = 32
 SKIN_ROW_MAP = defaultdict(int)
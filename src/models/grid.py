@@ -1,8 +1,7 @@
 import numpy as np
 from collections import namedtuple
-from pandas import DataFrame
 from models.puyo import Puyo, Direc
-from copy import deepcopy
+from copy import copy, deepcopy
 
 
 class AbstractGrid:
@@ -10,6 +9,8 @@ class AbstractGrid:
     An abstract grid of puyo enumeration elements (including hidden rows).
     Supports set by slice, get by single key, iteration over elements,
     equality, and the difference operator. Use classmethod constructors.
+    Grids may share their elements (see **view**); shared elements are
+    read-only and are copied by the first grid to write to them.
     """
 
     GridElem = namedtuple("GridElem", "pos, puyo")
@@ -34,12 +35,24 @@ class AbstractGrid:
         """(int, int): Shape of the grid (including hidden rows)."""
         return self._board.shape
 
+    @property
+    def codes(self):
+        """numpy.ndarray: The grid as integer puyo enumeration values."""
+        codes = np.fromiter(
+            (puyo.value for puyo in self._board.flat),
+            dtype=np.int8,
+            count=self._board.size,
+        )
+        return codes.reshape(self.shape)
+
     @property
     def colors(self):
         """set(Puyo): Set of unique puyo enumerations contained in the grid."""
         return set(self._board.flatten())
 
     def __setitem__(self, subscript, value):
+        if not self._board.flags.writeable:
+            self._board = self._board.copy()
         self._board[subscript] = value
 
     def __iter__(self):
@@ -59,12 +72,24 @@ class AbstractGrid:
         col_names = ["c" + str(i + 1) for i in range(width)]
         row_names1 = ["r" + str(i + 1) for i in reversed(range(height - self.nhide))]
         row_names2 = ["h" + str(i + 1) for i in reversed(range(self.nhide))]
+        row_names = row_names2 + row_names1
+
+        # Tabulated as a pandas dataframe would print, without needing pandas.
+        cells = [[str(puyo) for puyo in row] for row in board_flipped]
+        widths = [
+            max([len(name)] + [len(row[c]) + 1 for row in cells])
+            for c, name in enumerate(col_names)
+        ]
+        index_width = max([len(name) for name in row_names])
 
-        dataframe = DataFrame(board_flipped)
-        dataframe.columns = col_names
-        dataframe.index = row_names2 + row_names1
+        def line(index, row):
+            return index.ljust(index_width) + "".join(
+                [" " + text.rjust(w) for text, w in zip(row, widths)]
+            )
 
-        return dataframe.__str__()
+        lines = [line("", col_names)]
+        lines += [line(name, row) for name, row in zip(row_names, cells)]
+        return "\n".join(lines)
 
     def __sub__(self, other):
         """Return the set of grid elements in self that are different from other."""
@@ -78,6 +103,11 @@ class AbstractGrid:
     def __ne__(self, other):
         return not self == other
 
+    def view(self):
+        """Return a grid sharing the (now read-only) elements of **self**."""
+        self._board.setflags(write=False)
+        return copy(self)
+
     def reset(self):
         """Set all elements to empty. Return **self**."""
         self[:] = Puyo.NONE
@@ -104,11 +134,8 @@ class AbstractGrid:
         return set([elem for elem in self if Direc.adj_direc(subscript, elem.pos)])
 
     def apply_color_map(self, cmap):
-        new_board = deepcopy(self._board)
-        for cbefore, cafter in cmap:
-            new_board[self._board == cbefore] = cafter
-
-        self._board = new_board
+        """Recolor the grid by the given color map (see **Puyo.color_maps**)."""
+        self._board = cmap[self.codes]
 
     @staticmethod
     def _tighten(board):
@@ -197,41 +224,79 @@ class BoardGrid(AbstractGrid):
     the board grid. A history of moves is recorded and the board may be reverted.
     """
 
+    ChainStep = namedtuple("ChainStep", "grid, pops")
+
     def __init__(self, shape, nhide):
         super().__init__(shape, nhide)
         self._boardlist = []
 
+    def view(self):
+        """Return a grid sharing the elements and move history of **self**."""
+        for board in self._boardlist:
+            board.setflags(write=False)
+        grid = super().view()
+        grid._boardlist = list(self._boardlist)
+        return grid
+
     def _col_height(self, idx):
         if all(self._board[:, idx] != Puyo.NONE):
             return self.shape[0]
         else:
             return np.argmin(self._board[:, idx] != Puyo.NONE)
 
+    def has_floating(self, col=None):
+        """Return **True** if any element (in the given column) is floating."""
+        board = self._board if col is None else self._board[:, col : col + 1]
+        filled = board != Puyo.NONE
+        return bool(np.any(filled[1:] & ~filled[:-1]))
+
+    def color_group(self, pos):
+        """
+        Return the set of visible element positions connected to the element
+        position by puyos of the same color (excluding garbage).
+        """
+        puyo = self[pos]
+        if not Puyo.is_color(puyo) or self.is_hidden(pos):
+            return set()
+
+        nrows = self.shape[0] - self.nhide
+        group, frontier = {pos}, [pos]
+        while frontier:
+            r, c = frontier.pop()
+            for adj in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+                if adj in group:
+                    continue
+                elif not (0 <= adj[0] < nrows and 0 <= adj[1] < self.shape[1]):
+                    continue
+                elif self._board[adj] is puyo:
+                    group.add(adj)
+                    frontier.append(adj)
+
+        return group
+
     def pop_set(self, poplimit):
-        popset = set()
-        for elem in self:
-            if not Puyo.is_color(elem.puyo):
+        """
+        Return the set of grid elements to pop: every visible same-colored
+        group of atleast the pop limit, together with adjacent visible garbage.
+        """
+        popset, seen = set(), set()
+        for pos in np.ndindex(self.shape):
+            if pos in seen:
+                continue
+
+            group = self.color_group(pos)
+            seen |= group
+            if len(group) < poplimit:
                 continue
 
-            popgroup = set({elem})
-            while True:
-                last_popgroup = popgroup.copy()
-                for elem in last_popgroup:
-                    if not Puyo.is_color(elem.puyo):
+            for r, c in group:
+                popset.add(self.GridElem((r, c), self._board[r, c]))
+                for adj in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+                    if not (0 <= adj[1] < self.shape[1] and 0 <= adj[0]):
                         continue
-                    elif self.is_hidden(elem.pos):
+                    elif self.is_hidden(adj) or self._board[adj] is not Puyo.GARBAGE:
                         continue
-
-                    adjelems = self.adjacent(elem.pos)
-                    adjelems = {adj for adj in adjelems if not self.is_hidden(adj.pos)}
-                    popgroup |= {adj for adj in adjelems if adj.puyo is Puyo.GARBAGE}
-                    popgroup |= {adj for adj in adjelems if adj.puyo is elem.puyo}
-
-                if last_popgroup == popgroup:
-                    break
-
-            if len({elem for elem in popgroup if Puyo.is_color(elem.puyo)}) >= poplimit:
-                popset |= popgroup
+                    popset.add(self.GridElem(adj, Puyo.GARBAGE))
 
         return popset
 
@@ -242,28 +307,84 @@ class BoardGrid(AbstractGrid):
 
         return self.gravitize()
 
+    def resolve_chain(self, poplimit):
+        """
+        Pop and gravitize repeatedly until nothing more pops. The board is
+        left in its settled state.
+
+        Returns:
+            [ChainStep]: A snapshot of the board before each pop, together
+            with the set of grid elements popped.
+        """
+        steps = []
+        while True:
+            popset = self.pop_set(poplimit)
+            if not popset:
+                return steps
+            snapshot = BoardGrid(self._board.copy(), self.nhide)
+            steps.append(self.ChainStep(snapshot, popset))
+            self.execute_pop(poplimit)
+
+    def replay(self, moves, poplimit):
+        """
+        Replay the given moves from the initial board, resolving every chain.
+        The board is unchanged.
+
+        Returns:
+            [BoardGrid]: The settled board before the first move and after
+            each move, sharing their (read-only) elements with the replay.
+        """
+        board = self.view().revert()
+
+        def snapshot():
+            board._board.setflags(write=False)
+            return BoardGrid(board._board, board.nhide)
+
+        board.resolve_chain(poplimit)
+        states = [snapshot()]
+        for move in moves:
+            board.apply_move(move)
+            board.resolve_chain(poplimit)
+            states.append(snapshot())
+
+        return states
+
+    def restore(self, states, index):
+        """
+        Set the board to the replayed state of the given index, with the
+        states before it as the move history (see **replay**). Return **self**.
+        """
+        self._board = states[index]._board
+        self._boardlist = [state._board for state in states[:index]]
+        return self
+
+    def landing(self, move):
+        """
+        Return the set of grid elements the given move would occupy once
+        dropped, found from the column heights alone. The board is unchanged.
+        """
+        landing = set()
+        puyos, _, coff = move.grid.reorient(move.direc)
+        for cidx, puyocol in enumerate(puyos._board.T):
+            col_idx = cidx + coff + move.col
+            if col_idx < 0 or col_idx >= self.shape[1]:
+                continue
+            puyocol = [puyo for puyo in puyocol if puyo is not Puyo.NONE]
+            rstart = self._col_height(col_idx)
+            for ridx, puyo in enumerate(puyocol[: self.shape[0] - rstart]):
+                landing.add(self.GridElem((rstart + ridx, col_idx), puyo))
+
+        return landing
+
     def apply_move(self, move):
         """Apply the given move to the board and return **self**."""
 
         # First record the move and the pre-application board.
         self._boardlist.append(self._board.copy())
 
-        def apply_by_column(puyos, leftcol):
-            for cidx, puyocol in enumerate(puyos._board.T):
-                col_idx = cidx + leftcol
-                if col_idx < 0 or col_idx >= self.shape[1]:
-                    continue
-                puyocol = [puyo for puyo in puyocol if puyo is not Puyo.NONE]
-                rstart = self._col_height(col_idx)
-                for ridx, puyo in enumerate(puyocol):
-                    rend = rstart + ridx
-                    if rend < self.shape[0]:
-                        self[rend, col_idx] = puyo
-                    else:
-                        break
+        for elem in self.landing(move):
+            self[elem.pos] = elem.puyo
 
-        puyos, _, coff = move.grid.reorient(move.direc)
-        apply_by_column(puyos, coff + move.col)
         return self
 
     def revert_move(self):
@@ -338,6 +459,12 @@ class Move:
         self.col = col
         self.direc = direc
 
+    def view(self):
+        """Return a move sharing the (now read-only) grid of **self**."""
+        move = copy(self)
+        move.grid = self.grid.view()
+        return move
+
     def __eq__(self, move):
         grid1, coff1 = self.grid.finalize(self.direc)
         grid2, coff2 = move.grid.finalize(move.direc)
@@ -1,9 +1,11 @@
 from models.puyo import Puyo
 from models.puzzle import Puzzle
+from models.validation import ValidationIndex, digest
+from models.directory import ModuleIndex
+from models.rules import RuleScope, ScopedRule, check_puzzles
 from copy import deepcopy
 import os
 import yaml
-import multiprocessing as mp
 from constants import SELFCOMPAT_FILE
 from itertools import combinations
 
@@ -12,7 +14,6 @@ from constants import (
     MODULE_PARAMETERS,
     METADATA_FILE,
     PUZZLE_FILE_EXT,
-    PUZZLE_FILE_ROOT,
     SELFCOMPAT_FILE,
 )
 
@@ -87,39 +88,130 @@ class PuzzleModule:
         module._specify_rules()
         module.puzzles = {}
 
+        with open(MODULE_DIRECTORY + modulename + METADATA_FILE, "r") as infile:
+            module.validation = ValidationIndex.load(
+                modulename, infile.read(), module.rules
+            )
+
         return module
 
     @staticmethod
     def load(modulename):
         """
         Args:
-            modulename (str): Must be on file (with metadata).
+            modulename (str): Must be on file (with metadata), and every puzzle
+            file must be valid.
+        """
+        module, invalid = PuzzleModule.load_partial(modulename)
+        assert not invalid
+
+        return module
+
+    @staticmethod
+    def load_partial(modulename):
+        """
+        Load a module as **load** does, but skip any puzzle file which fails
+        to load (as **reload_puzzles** does).
+
+        Returns:
+            (PuzzleModule, set(str)): The module, and the skipped puzzle files.
         """
 
         # Load metadata attributes.
         with open(MODULE_DIRECTORY + modulename + METADATA_FILE, "r") as infile:
-            safe_data = yaml.safe_load(infile)
+            metadata_text = infile.read()
+            safe_data = yaml.safe_load(metadata_text)
             kwargs = PuzzleModule._fromyaml(safe_data)
             module = PuzzleModule(**kwargs)
             module._validate_metadata()
             module._specify_rules()
 
+        # Puzzles whose file content is unchanged since last validated skip the rules.
+        validation = ValidationIndex.load(modulename, metadata_text, module.rules)
+        module.validation = validation
+
         module.puzzles = {}
-        _, _, filenames = next(os.walk(MODULE_DIRECTORY + modulename))
-        for filename in filenames:
-            if not filename.startswith(PUZZLE_FILE_ROOT):
-                continue
-            elif not filename.endswith(PUZZLE_FILE_EXT):
-                continue
+        filenames = ModuleIndex.of(modulename).filenames
+        invalid = module._load_puzzles(modulename, filenames)
 
-            puzzle = Puzzle.load(filename, modulename, module)
-            assert puzzle.apply_rules()
+        validation.prune(filenames)
+        validation.save()
 
-            module.puzzles[filename.rstrip(PUZZLE_FILE_EXT)] = puzzle
+        return module, invalid
 
-        return module
+    def reload_puzzles(self, modulename, changed, removed):
+        """
+        Reload only the given puzzle files (added or modified on file) and
+        forget the removed ones. Puzzles which fail to load are forgotten.
+
+        Returns:
+            set(str): The changed puzzle files which could not be loaded.
+        """
+        for filename in removed:
+            self.puzzles.pop(filename.rstrip(PUZZLE_FILE_EXT), None)
+            self.validation.discard(filename)
+
+        invalid = self._load_puzzles(modulename, changed)
+        self.validation.save()
+        return invalid
+
+    def puzzle_digest(self, name):
+        """Return the content hash of a loaded puzzle (see **ValidationIndex**)."""
+        return self.validation.records[name + PUZZLE_FILE_EXT][0]
+
+    def _load_puzzles(self, modulename, filenames):
+        """
+        Load puzzle files into **self.puzzles**, applying the rules only to
+        the puzzle files changed since they were last validated.
+
+        Returns:
+            set(str): The puzzle files which could not be loaded.
+        """
+        invalid, unchecked = set(), []
+        for filename in filenames:
+            name = filename.rstrip(PUZZLE_FILE_EXT)
+            self.puzzles.pop(name, None)
+
+            try:
+                with open(MODULE_DIRECTORY + modulename + "/" + filename) as infile:
+                    text = infile.read()
+                puzzle = Puzzle.parse(text, modulename, self)
+            except (
+                OSError,
+                yaml.YAMLError,
+                AttributeError,
+                LookupError,
+                TypeError,
+                ValueError,
+            ):
+                invalid.add(filename)
+                self.validation.discard(filename)
+                continue
+
+            puzzle_digest = digest(text)
+            valid = self.validation.lookup(filename, puzzle_digest)
+            if valid is None:
+                unchecked.append((filename, puzzle_digest, puzzle))
+            elif valid:
+                self.puzzles[name] = puzzle
+            else:
+                invalid.add(filename)
+
+        # Check every changed puzzle in a single batch.
+        violations = check_puzzles(self, [puzzle for _, _, puzzle in unchecked])
+        for (filename, puzzle_digest, puzzle), violation in zip(unchecked, violations):
+            self.validation.record(filename, puzzle_digest, not violation)
+            if violation:
+                invalid.add(filename)
+            else:
+                self.puzzles[filename.rstrip(PUZZLE_FILE_EXT)] = puzzle
+
+        return invalid
 
     def self_compatible(self, thread):
+        # Multiprocessing is only needed here, so keep it off the startup path.
+        import multiprocessing as mp
+
         pool_args = []
         combos = combinations(self.puzzles.items(), 2)
 
@@ -156,27 +248,81 @@ class PuzzleModule:
         """
         Each rule has the signature rule(puzzle, force). If force is True,
         then the rule may take corrective action. Each rule returns whether
-        the puzzle is compliant to the rule.
+        the puzzle is compliant to the rule. Each rule is also scoped to the
+        region of the puzzle it depends on (see **RuleEvaluator**).
         """
-        rules = []
-        rules.append(self._rule_metadata_matches_board_shape)
-        rules.append(self._rule_metadata_matches_move_shape)
-        rules.append(self._rule_atleast_one_move)  # has force
-        rules.append(self._rule_move_lacks_garbage)  # has force
-        rules.append(self._rule_minimum_move_size)  # has force
-        rules.append(self._rule_color_limit)
-        rules.append(self._rule_move_fits_horizontally)  # has force
-        rules.append(self._rule_no_floating_puyos)
-        rules.append(self._rule_no_pop_groups)
-        self.rules = rules
+        scoped_rules = []
+        scoped_rules.append(
+            ScopedRule(
+                self._rule_metadata_matches_board_shape,
+                RuleScope.BOARD,
+                lambda puzzle, pos: True,
+            )
+        )
+        scoped_rules.append(
+            ScopedRule(
+                self._rule_metadata_matches_move_shape,
+                RuleScope.MOVE,
+                self._move_matches_move_shape,
+            )
+        )
+        scoped_rules.append(
+            ScopedRule(self._rule_atleast_one_move, RuleScope.DRAWPILE, None)
+        )  # has force
+        scoped_rules.append(
+            ScopedRule(
+                self._rule_move_lacks_garbage,
+                RuleScope.MOVE,
+                self._move_lacks_garbage,
+            )
+        )  # has force
+        scoped_rules.append(
+            ScopedRule(
+                self._rule_minimum_move_size,
+                RuleScope.MOVE,
+                self._move_minimum_size,
+            )
+        )  # has force
+        scoped_rules.append(ScopedRule(self._rule_color_limit, RuleScope.PUZZLE, None))
+        scoped_rules.append(
+            ScopedRule(
+                self._rule_move_fits_horizontally,
+                RuleScope.MOVE,
+                self._move_fits_horizontally,
+            )
+        )  # has force
+        scoped_rules.append(
+            ScopedRule(
+                self._rule_no_floating_puyos,
+                RuleScope.BOARD,
+                self._cell_no_floating_puyos,
+            )
+        )
+        scoped_rules.append(
+            ScopedRule(
+                self._rule_no_pop_groups,
+                RuleScope.BOARD,
+                self._cell_no_pop_groups,
+            )
+        )
+        self.scoped_rules = scoped_rules
+        self.rules = [scoped_rule.rule for scoped_rule in scoped_rules]
 
     def _rule_no_pop_groups(self, puzzle, force):
         return len(puzzle.board.pop_set(self.pop_limit)) == 0
 
+    def _cell_no_pop_groups(self, puzzle, pos):
+        if not Puyo.is_color(puzzle.board[pos]):
+            return True
+        return len(puzzle.board.color_group(pos)) < self.pop_limit
+
     def _rule_no_floating_puyos(self, puzzle, force):
         board_copy = deepcopy(puzzle.board)
         return board_copy.gravitize() == puzzle.board
 
+    def _cell_no_floating_puyos(self, puzzle, pos):
+        return not puzzle.board.has_floating(col=pos[1])
+
     def _rule_metadata_matches_board_shape(self, puzzle, force):
         visr, visc = self.board_shape
         shape = (visr + puzzle.board.nhide, visc) == puzzle.board.shape
@@ -184,59 +330,75 @@ class PuzzleModule:
         return shape and nhide
 
     def _rule_metadata_matches_move_shape(self, puzzle, force):
-        return all([self.move_shape == move.shape for move in puzzle.moves])
+        return self._all_moves(self._move_matches_move_shape, puzzle, force)
+
+    def _move_matches_move_shape(self, puzzle, index, force):
+        return self.move_shape == puzzle.moves[index].shape
 
     def _rule_atleast_one_move(self, puzzle, force):
+        # A new move is made compliant by the move rules which follow.
         if not puzzle.moves and not force:
             return False
         elif not puzzle.moves:
             puzzle.new_move()
-            puzzle.apply_rules(force=True)
 
         return True
 
     def _rule_move_lacks_garbage(self, puzzle, force):
-        for move in puzzle.moves:
-            for elem in move.grid:
-                if elem.puyo is Puyo.GARBAGE and not force:
-                    return False
-                elif elem.puyo is Puyo.GARBAGE:
-                    puyo = elem.puyo.next_(cond=Puyo.isnot_garbage)
-                    move.grid[elem.pos] = puyo
+        return self._all_moves(self._move_lacks_garbage, puzzle, force)
+
+    def _move_lacks_garbage(self, puzzle, index, force):
+        move = puzzle.moves[index]
+        for elem in move.grid:
+            if elem.puyo is Puyo.GARBAGE and not force:
+                return False
+            elif elem.puyo is Puyo.GARBAGE:
+                puyo = elem.puyo.next_(cond=Puyo.isnot_garbage)
+                move.grid[elem.pos] = puyo
 
         return True
 
     def _rule_minimum_move_size(self, puzzle, force):
+        return self._all_moves(self._move_minimum_size, puzzle, force)
+
+    def _move_minimum_size(self, puzzle, index, force):
         required = {(0, 0), (1, 0)}
-        for move in puzzle.moves:
-            for elem in move.grid:
-                violates = elem.pos in required and not Puyo.is_color(elem.puyo)
-                if violates and not force:
-                    return False
-                elif violates:
-                    puyo = elem.puyo.next_(cond=Puyo.is_color)
-                    move.grid[elem.pos] = puyo
+        move = puzzle.moves[index]
+        for elem in move.grid:
+            violates = elem.pos in required and not Puyo.is_color(elem.puyo)
+            if violates and not force:
+                return False
+            elif violates:
+                puyo = elem.puyo.next_(cond=Puyo.is_color)
+                move.grid[elem.pos] = puyo
 
         return True
 
     def _rule_color_limit(self, puzzle, force):
-        colors = set.union(*tuple([move.grid.colors for move in puzzle.moves]))
+        colors = set().union(*tuple([move.grid.colors for move in puzzle.moves]))
         colors |= puzzle.board.colors
         colors -= {Puyo.NONE, Puyo.GARBAGE}
         return len(colors) <= self.color_limit
 
     def _rule_move_fits_horizontally(self, puzzle, force):
-        for idx, move in enumerate(puzzle.moves):
-            new_move = puzzle.hover.fit_move(move)
-            if not new_move == move and not force:
-                return False
-            elif not new_move == move:
-                puzzle.moves[idx] = new_move
+        return self._all_moves(self._move_fits_horizontally, puzzle, force)
+
+    def _move_fits_horizontally(self, puzzle, index, force):
+        move = puzzle.moves[index]
+        new_move = puzzle.hover.fit_move(move)
+        if not new_move == move and not force:
+            return False
+        elif not new_move == move:
+            puzzle.moves[index] = new_move
 
         return True
 
+    @staticmethod
+    def _all_moves(move_rule, puzzle, force):
+        return all([move_rule(puzzle, idx, force) for idx in range(len(puzzle.moves))])
+
     def _toyaml(self):
-        dump = self.__dict__
+        dump = dict(self.__dict__)
         for (k, v) in dump.items():
             if isinstance(v, tuple):
                 dump[k] = list(v)
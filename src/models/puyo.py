@@ -1,5 +1,9 @@
 from enum import Enum, auto
 from itertools import permutations
+import numpy as np
+
+# The color permutation lookup tables, built on first use (see Puyo.color_maps).
+_color_maps = {}
 
 
 class EnumCycle(Enum):
@@ -73,15 +77,34 @@ class Puyo(EnumCycle):
 
     @staticmethod
     def color_maps():
-        colors = [puyo for puyo in Puyo if Puyo.is_color(puyo)]
-        cpermute = permutations(colors)
-        cmaps = set()
-        for c1 in cpermute:
-            for c2 in cpermute:
-                cmap = zip(c1, c2)
-                cmaps.add(frozenset(cmap))
-
-        return cmaps
+        """
+        Return every permutation of the colors (the identity first) as a table
+        of color maps. Each row maps puyo values to puyos, such that a grid of
+        puyo values is recolored by indexing the row with it.
+        """
+        if not _color_maps:
+            colors = [puyo for puyo in Puyo if Puyo.is_color(puyo)]
+            cpermute = list(permutations(colors))
+            table = np.empty((len(cpermute), len(Puyo) + 1), dtype=object)
+            for puyo in Puyo:
+                table[:, puyo.value] = puyo
+            for idx, permuted in enumerate(cpermute):
+                for cbefore, cafter in zip(colors, permuted):
+                    table[idx, cbefore.value] = cafter
+            table.setflags(write=False)
+
+            _color_maps["table"] = table
+            index = {tuple(row[1:]): idx for idx, row in enumerate(table)}
+            _color_maps["index"] = index
+
+        return _color_maps["table"]
+
+    @staticmethod
+    def compose_color_maps(first, second):
+        """Return the index of the color map applying **first** then **second**."""
+        table = Puyo.color_maps()
+        composed = [table[second, puyo.value] for puyo in table[first, 1:]]
+        return _color_maps["index"][tuple(composed)]
 
 
 class Direc(EnumCycle):
@@ -1,7 +1,9 @@
 from models.grid import BoardGrid, HoverGrid, Move
 from models.puyo import Direc, Puyo
-from constants import PUZZLE_FILE_ROOT, PUZZLE_FILE_EXT, MODULE_DIRECTORY
-import os
+from models.validation import digest
+from models.rules import check_puzzle
+from models.directory import ModuleIndex
+from constants import PUZZLE_FILE_EXT, MODULE_DIRECTORY
 import yaml
 from copy import deepcopy
 import numpy as np
@@ -17,6 +19,7 @@ class Puzzle:
         puzzle.hover = HoverGrid.new(module.board_shape, module.move_shape)
         puzzle.module = module
         puzzle.path = path
+        puzzle.cmap = 0
 
         puzzle.apply_rules(force=True)
 
@@ -24,6 +27,11 @@ class Puzzle:
 
     @staticmethod
     def load(puzzlename, path, module):
+        with open(MODULE_DIRECTORY + path + "/" + puzzlename, "r") as infile:
+            return Puzzle.parse(infile.read(), path, module)
+
+    @staticmethod
+    def parse(text, path, module):
         def yaml2board(yml):
             board = BoardGrid.new(shape=module.board_shape, nhide=module.board_nhide)
             str_board = list(reversed([s.split(" ") for s in yml]))
@@ -41,8 +49,7 @@ class Puzzle:
                 move.grid[row, col] = Puyo[puyo_str]
             return move
 
-        with open(MODULE_DIRECTORY + path + "/" + puzzlename, "r") as infile:
-            safe_data = yaml.safe_load(infile)
+        safe_data = yaml.safe_load(text)
 
         puzzle = Puzzle()
         puzzle.board = yaml2board(safe_data["board"])
@@ -50,19 +57,37 @@ class Puzzle:
         puzzle.module = module
         puzzle.hover = HoverGrid.new(module.board_shape, module.move_shape)
         puzzle.path = path
+        puzzle.cmap = 0
 
         return puzzle
 
+    def session(self):
+        """
+        Return a puzzle to play or edit independently of **self**. The board,
+        board history, and moves are shared read-only until either puzzle
+        writes to them; the module is shared.
+        """
+        session = Puzzle()
+        session.board = self.board.view()
+        session.moves = [move.view() for move in self.moves]
+        session.hover = HoverGrid.new(self.module.board_shape, self.module.move_shape)
+        session.module = self.module
+        session.path = self.path
+        session.cmap = self.cmap
+
+        return session
+
     def save(self):
         def grid2list(grid):
             grid = grid._board.tolist()
             grid = [" ".join([puyo.name for puyo in row]) for row in grid]
             return list(reversed(grid))
 
-        puzzle_to_save = deepcopy(self)
+        puzzle_to_save = self.session()
         puzzle_to_save.board.revert()
 
-        filename = next_puzzle_name(MODULE_DIRECTORY + puzzle_to_save.path)
+        index = ModuleIndex.of(puzzle_to_save.path)
+        filename = index.next_name()
         filepath = MODULE_DIRECTORY + puzzle_to_save.path + "/" + filename
 
         data = dict()
@@ -72,10 +97,19 @@ class Puzzle:
             for move in puzzle_to_save.moves
         ]
 
+        text = yaml.dump(data)
         with open(filepath, "w") as outfile:
-            yaml.dump(data, outfile)
+            outfile.write(text)
+
+        # Record the actual result, so that a puzzle which breaks the rules
+        # is not trusted (nor tested) until its file is fixed.
+        valid = not check_puzzle(puzzle_to_save)
+        index.add(filename)
+        self.module.validation.record(filename, digest(text), valid)
+        self.module.validation.save()
 
-        self.module.puzzles[filename.rstrip(PUZZLE_FILE_EXT)] = puzzle_to_save
+        if valid:
+            self.module.puzzles[filename.rstrip(PUZZLE_FILE_EXT)] = puzzle_to_save
 
     def apply_rules(self, force=False):
         return all([rule(self, force) for rule in self.module.rules])
@@ -85,19 +119,54 @@ class Puzzle:
         self.moves.insert(index, new_move)
         return new_move
 
+    def trim_moves(self, nmoves):
+        """
+        Apply the moves in excess of nmoves to the board (first to last),
+        settling any chain after each as the solution would be played, and
+        forget the board history.
+
+        Returns:
+            [ChainStep]: The chain steps which last settled the board (see
+            **BoardGrid.resolve_chain**).
+        """
+        poplimit = self.module.pop_limit
+        steps = self.board.resolve_chain(poplimit)
+        while len(self.moves) > nmoves:
+            self.board.apply_move(self.moves.pop(0))
+            steps = self.board.resolve_chain(poplimit)
+            self.board._boardlist = []
+
+        return steps
+
     def randomize_color(self):
-        cmap = random.sample(Puyo.color_maps(), 1)[0]
-        self.apply_color_map(cmap)
+        self.apply_color_map(random.randrange(len(Puyo.color_maps())))
 
     def apply_color_map(self, cmap):
-        self.board.apply_color_map(cmap)
-        for move in self.moves:
-            move.grid.apply_color_map(cmap)
+        """
+        Recolor the board and moves by the color map of the given index (see
+        **Puyo.color_maps**), remapped together in one lookup. The index of
+        the overall color map since the puzzle was loaded is kept in **cmap**.
+        """
+        grids = [self.board] + [move.grid for move in self.moves]
+        codes = np.fromiter(
+            (puyo.value for grid in grids for puyo in grid._board.flat),
+            dtype=np.int8,
+            count=sum([grid._board.size for grid in grids]),
+        )
+        puyos = Puyo.color_maps()[cmap][codes]
+
+        start = 0
+        for grid in grids:
+            end = start + grid._board.size
+            grid._board = puyos[start:end].reshape(grid.shape)
+            start = end
+
+        self.cmap = Puyo.compose_color_maps(self.cmap, cmap)
 
     @staticmethod
     def compatible_over_colors(x):
         this, thisname, other, othername = x
-        cmaps = Puyo.color_maps()
+        cmaps = range(len(Puyo.color_maps()))
         for this_cmap in cmaps:
             this_puzzle = deepcopy(this)
             this_puzzle.apply_color_map(this_cmap)
@@ -167,15 +236,3 @@ class Puzzle:
             pstring += self.hover.assign_move(move).__str__()
 
         return pstring
-
-
-def next_puzzle_name(path):
-    def ind2name(idx):
-        return PUZZLE_FILE_ROOT + str(idx + 1) + PUZZLE_FILE_EXT
-
-    _, _, filenames = next(os.walk(path))
-    idx = 0
-    while ind2name(idx) in filenames:
-        idx += 1
-
-    return ind2name(idx)
@@ -0,0 +1,209 @@
+from collections import namedtuple
+from models.puyo import PopState
+from models.graphic import grid2tiles
+from constants import DRAWPILE_VISIBLE
+import numpy as np
+
+# Headless rendering of puzzles to images, without Qt. Frames hold only
+# (skin-independent) tile ids; images are composited from a skin's tile table.
+# The game views also build their frames here, so OpenCV (slow to import) is
+# only loaded by the functions which composite images.
+
+
+Frame = namedtuple("Frame", "board, drawpile, hover, nremaining")
+
+
+def resting_frame(puzzle, draw_index):
+    """
+    Return the **Frame** of the settled board, with the move at the draw
+    index (if any) hovering above it and its landing cells shown as ghosts.
+    The move is assigned to the puzzle hover grid.
+    """
+    try:
+        move = puzzle.moves[draw_index]
+    except IndexError:
+        move = None
+
+    puzzle.hover.assign_move(move)
+    ghosts = puzzle.board.landing(move) if move is not None else set()
+
+    return Frame(
+        board=grid2tiles(puzzle.board, ghosts),
+        drawpile=_drawpile_tiles(puzzle.moves, draw_index + 1),
+        hover=grid2tiles(puzzle.hover),
+        nremaining=len(puzzle.moves) - draw_index,
+    )
+
+
+def chain_frames(puzzle, steps, draw_index):
+    """
+    Return a **Frame** for each pop state of each chain step (see
+    **BoardGrid.resolve_chain**). The puzzle hover grid is emptied.
+    """
+    puzzle.hover.assign_move(None)
+    drawpile = _drawpile_tiles(puzzle.moves, draw_index)
+    hover = grid2tiles(puzzle.hover)
+    nremaining = len(puzzle.moves) - draw_index
+
+    return [
+        Frame(
+            board=grid2tiles(step.grid, set(), step.pops, popstate),
+            drawpile=drawpile,
+            hover=hover,
+            nremaining=nremaining,
+        )
+        for step in steps
+        for popstate in PopState
+    ]
+
+
+def solution_frames(puzzle):
+    """
+    Replay the puzzle moves from its current board.
+
+    Returns:
+        [[Frame]]: The frames of the initial board, then those of each move
+        (its chain frames followed by the resting frame after it).
+    """
+    poplimit = puzzle.module.pop_limit
+    steps = puzzle.board.resolve_chain(poplimit)
+    timeline = [chain_frames(puzzle, steps, 0) + [resting_frame(puzzle, 0)]]
+
+    for draw_index, move in enumerate(puzzle.moves, start=1):
+        puzzle.board.apply_move(move)
+        steps = puzzle.board.resolve_chain(poplimit)
+        timeline.append(
+            chain_frames(puzzle, steps, draw_index)
+            + [resting_frame(puzzle, draw_index)]
+        )
+
+    return timeline
+
+
+def replay_frames(puzzle):
+    """
+    Replay the puzzle moves from its initial board (see **BoardGrid.replay**).
+    The puzzle is unchanged.
+
+    Returns:
+        ([BoardGrid], [Frame]): The settled board before the first move and
+        after each move, and the resting **Frame** of each.
+    """
+    session = puzzle.session()
+    states = session.board.replay(session.moves, puzzle.module.pop_limit)
+
+    frames = []
+    for draw_index, state in enumerate(states):
+        session.board = state
+        frames.append(resting_frame(session, draw_index))
+
+    return states, frames
+
+
+def tiles2image(table, tiles):
+    """Return the RGBA image of a grid of tile ids (bottom row last)."""
+    images = table.images[table.lut[tiles[::-1]]]
+    nrows, ncols, height, width, channel = images.shape
+    images = images.transpose(0, 2, 1, 3, 4)
+    return images.reshape(nrows * height, ncols * width, channel)
+
+
+def frame2image(table, frame):
+    """
+    Composite a **Frame** as laid out in the game view: the hover area above
+    the framed board, and the visible drawpile and move count to the right.
+
+    Returns:
+        numpy.ndarray: An opaque RGB image.
+    """
+    import cv2
+
+    board = tiles2image(table, frame.board)
+    hover = tiles2image(table, frame.hover)
+    drawpile = [tiles2image(table, tiles) for tiles in frame.drawpile]
+
+    left_width = board.shape[1] + 2 * BORDER
+    left_height = hover.shape[0] + board.shape[0] + 2 * BORDER
+    right_width = max([image.shape[1] for image in drawpile], default=0)
+    right_width = max(right_width, TEXT_WIDTH)
+
+    right_height = sum([image.shape[0] + MARGIN for image in drawpile]) + MARGIN
+    height = max(left_height, right_height) + 2 * MARGIN
+    width = left_width + MARGIN + right_width + 2 * MARGIN
+    canvas = np.empty((height, width, 3), np.uint8)
+    canvas[:] = BACKGROUND
+
+    _blit(canvas, hover, MARGIN, MARGIN + BORDER)
+    top = MARGIN + hover.shape[0]
+    cv2.rectangle(
+        canvas,
+        (MARGIN, top),
+        (MARGIN + left_width - 1, top + board.shape[0] + 2 * BORDER - 1),
+        FOREGROUND,
+        thickness=BORDER,
+    )
+    _blit(canvas, board, top + BORDER, MARGIN + BORDER)
+
+    top, left = MARGIN, MARGIN + left_width + MARGIN
+    for image in drawpile:
+        _blit(canvas, image, top, left)
+        top += image.shape[0] + MARGIN
+
+    cv2.putText(
+        canvas,
+        str(frame.nremaining) + " remaining.",
+        (left, canvas.shape[0] - MARGIN),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.4,
+        FOREGROUND,
+        lineType=cv2.LINE_AA,
+    )
+
+    return canvas
+
+
+def sheet2image(images, labels):
+    """Place images side by side, each captioned by its label."""
+    import cv2
+
+    height = max([image.shape[0] for image in images]) + CAPTION
+    width = sum([image.shape[1] for image in images])
+    sheet = np.empty((height, width, 3), np.uint8)
+    sheet[:] = BACKGROUND
+
+    left = 0
+    for image, label in zip(images, labels):
+        sheet[CAPTION : CAPTION + image.shape[0], left : left + image.shape[1]] = image
+        cv2.putText(
+            sheet,
+            label,
+            (left + MARGIN, CAPTION),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.4,
+            FOREGROUND,
+            lineType=cv2.LINE_AA,
+        )
+        left += image.shape[1]
+
+    return sheet
+
+
+def _drawpile_tiles(moves, start):
+    return [grid2tiles(move.grid) for move in moves[start : start + DRAWPILE_VISIBLE]]
+
+
+def _blit(canvas, image, top, left):
+    """Alpha-blend an RGBA image onto an RGB canvas."""
+    height, width = image.shape[:2]
+    region = canvas[top : top + height, left : left + width]
+    alpha = image[:, :, 3:].astype(np.uint16)
+    blend = image[:, :, :3] * alpha + region * (255 - alpha)
+    region[:] = (blend // 255).astype(np.uint8)
+
+
+BORDER = 2
+MARGIN = 10
+CAPTION = 16
+TEXT_WIDTH = 90
+BACKGROUND = (240, 240, 240)
+FOREGROUND = (0, 0, 0)
@@ -0,0 +1,199 @@
+from collections import namedtuple
+from constants import RESULTS_FILE
+import numpy as np
+import threading
+import sqlite3
+import queue
+import time
+import sys
+
+# A test attempt: the module, name and content hash of the puzzle (names are
+# reused, so results follow the hash), the index of the color map it was shown
+# with (see Puyo.color_maps), the number of moves tested, the seconds taken for
+# each move, whether the final board matched the solution, and the index of
+# the first move after which the board diverged from the solution (None if it
+# never did).
+Attempt = namedtuple(
+    "Attempt", "module, puzzle, digest, cmap, nmoves, timings, correct, first_wrong"
+)
+
+# The attempts of a puzzle: how many, how many were correct, their mean
+# duration, and the time and correctness of the last one.
+PuzzleStats = namedtuple(
+    "PuzzleStats", "attempts, correct, mean_time, last_time, last_correct"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    module TEXT NOT NULL,
+    puzzle TEXT NOT NULL,
+    cmap INTEGER NOT NULL,
+    nmoves INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    timings BLOB NOT NULL,
+    correct INTEGER NOT NULL,
+    first_wrong INTEGER,
+    digest TEXT
+);
+"""
+
+# Created once logs written before the content hash was kept gain its column.
+INDEX = "CREATE INDEX IF NOT EXISTS attempts_digest ON attempts (module, digest);"
+
+INSERT = (
+    "INSERT INTO attempts (time, module, puzzle, digest, cmap, nmoves, duration, "
+    "timings, correct, first_wrong) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def grade(response, solution):
+    """
+    Compare a played puzzle to its solution, both replayed from their initial
+    boards (see **BoardGrid.replay**).
+
+    Returns:
+        (bool, int): Whether the final boards match, and the index of the
+        first move after which the boards differ (**None** if none do).
+    """
+    poplimit = response.module.pop_limit
+    played = response.board.replay(response.moves, poplimit)
+    solved = solution.board.replay(solution.moves, poplimit)
+
+    first_wrong = None
+    for index, (board1, board2) in enumerate(zip(played[1:], solved[1:])):
+        if board1 != board2:
+            first_wrong = index
+            break
+
+    return played[-1] == solved[-1], first_wrong
+
+
+class ResultsLog:
+    """
+    An append-only log of test attempts, kept in an SQLite database in WAL
+    mode and indexed by puzzle. Attempts are queued by **record** and written
+    in batches by a background thread, so recording never waits on the disk.
+    """
+
+    def __init__(self, filepath=RESULTS_FILE):
+        self.filepath = filepath
+        self.queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, attempt):
+        """Queue an **Attempt** to be written."""
+        self.queue.put((time.time(),) + tuple(attempt))
+
+    def flush(self):
+        """Wait until every queued attempt is written."""
+        self.queue.join()
+
+    def close(self):
+        """Write any queued attempts and stop the writer thread."""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join()
+
+    def stats(self, module):
+        """
+        Return the **PuzzleStats** of each attempted puzzle of the module,
+        keyed by the content hash of the puzzle.
+        """
+        # SQLite takes the bare correct column from the row of MAX(time).
+        db = _connect(self.filepath)
+        try:
+            rows = db.execute(
+                "SELECT digest, COUNT(*), SUM(correct), AVG(duration), MAX(time), "
+                "correct FROM attempts WHERE module = ? AND digest IS NOT NULL "
+                "GROUP BY digest",
+                (module,),
+            ).fetchall()
+        finally:
+            db.close()
+
+        return {
+            row[0]: PuzzleStats(*row[1:5], last_correct=bool(row[5])) for row in rows
+        }
+
+    def attempts(self, module, digest):
+        """
+        Return the recorded **Attempt** list of a puzzle (by content hash),
+        oldest first.
+        """
+        db = _connect(self.filepath)
+        try:
+            rows = db.execute(
+                "SELECT module, puzzle, digest, cmap, nmoves, timings, correct, "
+                "first_wrong FROM attempts WHERE module = ? AND digest = ? ORDER BY id",
+                (module, digest),
+            ).fetchall()
+        finally:
+            db.close()
+
+        return [
+            Attempt(*row[:5], np.frombuffer(row[5], np.float32), bool(row[6]), row[7])
+            for row in rows
+        ]
+
+    def _run(self):
+        # A database which cannot be written to only loses the results.
+        try:
+            db = _connect(self.filepath)
+        except sqlite3.Error as err:
+            print("Results will not be recorded:", err, file=sys.stderr)
+            db = None
+
+        closing = False
+        while not closing:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            closing = None in batch
+            rows = [_row(item) for item in batch if item is not None]
+            if rows and db is not None:
+                try:
+                    with db:
+                        db.executemany(INSERT, rows)
+                except sqlite3.Error as err:
+                    print("Results were not recorded:", err, file=sys.stderr)
+
+            for _ in batch:
+                self.queue.task_done()
+
+        if db is not None:
+            db.close()
+
+
+def _connect(filepath):
+    db = sqlite3.connect(filepath)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEMA)
+    columns = [row[1] for row in db.execute("PRAGMA table_info(attempts)")]
+    if "digest" not in columns:
+        db.execute("ALTER TABLE attempts ADD COLUMN digest TEXT")
+    db.execute(INDEX)
+    return db
+
+
+def _row(item):
+    now, module, puzzle, digest, cmap, nmoves, timings, correct, first_wrong = item
+    timings = np.asarray(timings, dtype=np.float32)
+    return (
+        now,
+        module,
+        puzzle,
+        digest,
+        int(cmap),
+        int(nmoves),
+        float(timings.sum()),
+        timings.tobytes(),
+        int(bool(correct)),
+        first_wrong,
+    )
@@ -0,0 +1,300 @@
+from collections import namedtuple
+from enum import Enum, IntFlag, auto
+from models.puyo import Direc, Puyo
+import numpy as np
+
+
+class RuleScope(Enum):
+    """The region of a puzzle which a rule depends on."""
+
+    BOARD = auto()
+    MOVE = auto()
+    DRAWPILE = auto()
+    PUZZLE = auto()
+
+
+# A rule together with the region it depends on. Move and board rules also
+# have a local form which checks only part of the region: local(puzzle, index,
+# force) checks a single move and local(puzzle, pos) checks a single edited
+# board cell (assuming the rest of the board was already compliant).
+ScopedRule = namedtuple("ScopedRule", "rule, scope, local")
+
+# Cached validation results (see ValidationIndex) are discarded whenever this
+# changes, so it must be bumped whenever a rule or check_puzzles changes.
+RULES_VERSION = 1
+
+
+class RuleEvaluator:
+    """
+    Applies the module rules to a puzzle, but only re-runs the rules which
+    depend on the regions of the puzzle marked as changed since the last
+    evaluation. Every change to the puzzle must be marked.
+    """
+
+    def __init__(self, puzzle):
+        self.puzzle = puzzle
+        self.mark_all()
+
+    def mark_all(self):
+        """Mark the entire puzzle as changed."""
+        self._board = None
+        self._board_cells = set()
+        self._drawpile = None
+        self._puzzle = None
+        self._moves = [None] * len(self.puzzle.moves)
+
+    def mark_board(self, pos=None):
+        """Mark a single board cell (or the entire board) as changed."""
+        if pos is not None and self._board:
+            self._board_cells.add(pos)
+        else:
+            self._board = None
+            self._board_cells = set()
+        self._puzzle = None
+
+    def mark_move(self, index):
+        self._moves[index] = None
+        self._puzzle = None
+
+    def insert_move(self, index):
+        self._moves.insert(index, None)
+        self._drawpile = None
+        self._puzzle = None
+
+    def delete_move(self, index):
+        del self._moves[index]
+        self._drawpile = None
+        self._puzzle = None
+
+    def mark_drawpile(self):
+        """Mark every move, and the drawpile as a whole, as changed."""
+        self._moves = [None] * len(self.puzzle.moves)
+        self._drawpile = None
+        self._puzzle = None
+
+    def evaluate(self, force=False):
+        """
+        Re-run the rules affected by the marked changes. If force is True,
+        then previously non-compliant regions are also re-run so that the
+        rules may take corrective action. Return whether the puzzle is compliant.
+        """
+        puzzle = self.puzzle
+        rules = puzzle.module.scoped_rules
+
+        def stale(result):
+            return result is None or (force and not result)
+
+        def apply(scope):
+            return all([r.rule(puzzle, force) for r in rules if r.scope is scope])
+
+        # Drawpile rules run first since they may add moves.
+        if stale(self._drawpile):
+            self._drawpile = apply(RuleScope.DRAWPILE)
+            if len(self._moves) != len(puzzle.moves):
+                self.mark_drawpile()
+                self._drawpile = apply(RuleScope.DRAWPILE)
+
+        for index, result in enumerate(self._moves):
+            if stale(result):
+                self._moves[index] = all(
+                    [
+                        r.local(puzzle, index, force)
+                        for r in rules
+                        if r.scope is RuleScope.MOVE
+                    ]
+                )
+                self._puzzle = None
+
+        if stale(self._board):
+            self._board = apply(RuleScope.BOARD)
+            self._board_cells = set()
+            self._puzzle = None
+        elif self._board_cells:
+            self._board = all(
+                [
+                    r.local(puzzle, pos)
+                    for r in rules
+                    if r.scope is RuleScope.BOARD
+                    for pos in self._board_cells
+                ]
+            )
+            self._board_cells = set()
+
+        if stale(self._puzzle):
+            self._puzzle = apply(RuleScope.PUZZLE)
+
+        return self._drawpile and all(self._moves) and self._board and self._puzzle
+
+
+class Violation(IntFlag):
+    """A bitmask of module rule violations (see **check_puzzles**)."""
+
+    NONE = 0
+    BOARD_SHAPE = auto()
+    MOVE_SHAPE = auto()
+    NO_MOVES = auto()
+    MOVE_GARBAGE = auto()
+    MOVE_SIZE = auto()
+    COLOR_LIMIT = auto()
+    MOVE_FIT = auto()
+    FLOATING = auto()
+    POP_GROUP = auto()
+
+
+def check_puzzle(puzzle):
+    """Return the **Violation** bitmask of a single puzzle."""
+    return check_puzzles(puzzle.module, [puzzle])[0]
+
+
+def check_puzzles(module, puzzles):
+    """
+    Check every module rule (without corrective action) against a batch of
+    puzzles in a single vectorized pass over their coded boards and moves.
+
+    Returns:
+        [Violation]: The violations of each puzzle (zero if compliant).
+    """
+    npuzzles = len(puzzles)
+    is_color = _color_table()
+    flags = np.zeros(npuzzles, dtype=np.int64)
+    colors = np.zeros((npuzzles, len(is_color)), dtype=bool)
+
+    # Stack the boards of the correct shape.
+    visr, visc = module.board_shape
+    board_shape = (visr + module.board_nhide, visc)
+    board_ok = np.array(
+        [
+            p.board.shape == board_shape and p.board.nhide == module.board_nhide
+            for p in puzzles
+        ],
+        dtype=bool,
+    )
+    flags[~board_ok] |= Violation.BOARD_SHAPE
+    board_idx = np.flatnonzero(board_ok)
+    boards = np.array([puzzles[i].board.codes for i in board_idx], dtype=np.int8)
+    boards = boards.reshape((len(board_idx),) + board_shape)
+
+    # Stack the moves of the correct shape, tracking which puzzle owns each.
+    nmoves = np.array([len(p.moves) for p in puzzles], dtype=np.int64)
+    flags[nmoves == 0] |= Violation.NO_MOVES
+    move_list, owners, cols, direcs = [], [], [], []
+    for idx, puzzle in enumerate(puzzles):
+        for move in puzzle.moves:
+            if move.shape != module.move_shape:
+                flags[idx] |= Violation.MOVE_SHAPE
+                continue
+            move_list.append(move.grid.codes)
+            owners.append(idx)
+            cols.append(move.col)
+            direcs.append(move.direc.value)
+    moves = np.array(move_list, dtype=np.int8).reshape((-1,) + module.move_shape)
+    owners = np.array(owners, dtype=np.int64)
+
+    def flag_owners(violates, flag):
+        flags[np.unique(owners[violates])] |= flag
+
+    flag_owners((moves == Puyo.GARBAGE.value).any(axis=(1, 2)), Violation.MOVE_GARBAGE)
+    flag_owners(
+        ~(is_color[moves[:, 0, 0]] & is_color[moves[:, 1, 0]]), Violation.MOVE_SIZE
+    )
+    flag_owners(
+        ~_moves_fit(moves, np.array(cols), np.array(direcs), visc), Violation.MOVE_FIT
+    )
+
+    # Colors present across each board and all of its moves.
+    for puyo in Puyo:
+        if not Puyo.is_color(puyo):
+            continue
+        colors[board_idx, puyo.value] = (boards == puyo.value).any(axis=(1, 2))
+        np.logical_or.at(
+            colors[:, puyo.value], owners, (moves == puyo.value).any(axis=(1, 2))
+        )
+    flags[colors.sum(axis=1) > module.color_limit] |= Violation.COLOR_LIMIT
+
+    filled = boards != Puyo.NONE.value
+    floating = (filled[:, 1:] & ~filled[:, :-1]).any(axis=(1, 2))
+    flags[board_idx[floating]] |= Violation.FLOATING
+
+    visible = boards[:, :visr, :]
+    popping = _group_sizes(visible, is_color).max(axis=(1, 2)) >= module.pop_limit
+    flags[board_idx[popping]] |= Violation.POP_GROUP
+
+    return [Violation(int(flag)) for flag in flags]
+
+
+def _color_table():
+    """Return a lookup from puyo enumeration value to whether it is colored."""
+    table = np.zeros(max([puyo.value for puyo in Puyo]) + 1, dtype=bool)
+    for puyo in Puyo:
+        table[puyo.value] = Puyo.is_color(puyo)
+    return table
+
+
+def _moves_fit(moves, cols, direcs, ncols):
+    """
+    Return whether each (north-oriented) coded move fits the board horizontally
+    once oriented. Mirrors **MoveGrid.reorient** and **HoverGrid.fit_move**.
+    """
+    nrows, nmcols = moves.shape[1:]
+    filled = moves != Puyo.NONE.value
+
+    def extent(occupied, size):
+        nonempty = occupied.any(axis=1)
+        start = np.where(nonempty, occupied.argmax(axis=1), size)
+        end = np.where(nonempty, size - occupied[:, ::-1].argmax(axis=1), 0)
+        return start, end
+
+    rstart, rend = extent(filled.any(axis=2), nrows)
+    cstart, cend = extent(filled.any(axis=1), nmcols)
+
+    coff = np.select(
+        [
+            direcs == Direc.NORTH.value,
+            direcs == Direc.EAST.value,
+            direcs == Direc.SOUTH.value,
+        ],
+        [cstart, rstart, 1 - cend],
+        1 - rend,
+    )
+    vertical = (direcs == Direc.NORTH.value) | (direcs == Direc.SOUTH.value)
+    width = np.maximum(np.where(vertical, cend - cstart, rend - rstart), 0)
+
+    lcol = cols + coff
+    rcol = lcol + width - 1
+    return (lcol >= 0) & (rcol < ncols)
+
+
+def _group_sizes(boards, is_color):
+    """
+    Label the same-colored groups of a stack of coded boards by propagating
+    the minimum cell index between matching neighbors until stable.
+
+    Returns:
+        numpy.ndarray: The size of the group containing each colored cell
+        (zero for empty and garbage cells).
+    """
+    colored = is_color[boards]
+    unlabeled = boards.size
+    labels = np.where(colored, np.arange(boards.size).reshape(boards.shape), unlabeled)
+
+    def neighbor(array, axis, step, fill):
+        shifted = np.roll(array, step, axis=axis)
+        edge = [slice(None)] * array.ndim
+        edge[axis] = 0 if step > 0 else -1
+        shifted[tuple(edge)] = fill
+        return shifted
+
+    shifts = [(1, 1), (1, -1), (2, 1), (2, -1)]
+    matches = [colored & (neighbor(boards, ax, st, 0) == boards) for ax, st in shifts]
+
+    while True:
+        new_labels = labels
+        for (ax, st), match in zip(shifts, matches):
+            adjacent = neighbor(labels, ax, st, unlabeled)
+            new_labels = np.where(match, np.minimum(new_labels, adjacent), new_labels)
+        if (new_labels == labels).all():
+            break
+        labels = new_labels
+
+    sizes = np.bincount(labels[colored], minlength=boards.size + 1)
+    return np.where(colored, sizes[np.minimum(labels, unlabeled)], 0)
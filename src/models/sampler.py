@@ -0,0 +1,168 @@
+from models.results import PuzzleStats
+from constants import SAMPLE_FAIL_WEIGHT
+import threading
+import random
+import time
+
+
+def attempt_weight(stats):
+    """
+    Return the sampling weight of a puzzle from its **PuzzleStats** (**None**
+    if never attempted). Failed puzzles are favored in proportion to their
+    failure rate, and more so while their last attempt is a failure.
+    """
+    if stats is None or not stats.attempts:
+        return 1.0
+
+    weight = 1.0 + SAMPLE_FAIL_WEIGHT * (1.0 - stats.correct / stats.attempts)
+    if not stats.last_correct:
+        weight += SAMPLE_FAIL_WEIGHT
+    return weight
+
+
+class PuzzleSampler:
+    """
+    Draws puzzle names at random in proportion to their weights (see
+    **attempt_weight**). The weights are kept in a Fenwick tree, so that
+    drawing a puzzle, recording an attempt, and adding or removing a puzzle
+    (e.g. as the module is reloaded) each take O(log n). Safe to share
+    between threads.
+
+    Puzzle names are reused, so stats follow the content hash of each puzzle
+    (see **PuzzleModule.puzzle_digest**).
+
+    Args:
+        puzzles (dict): The content hash of each puzzle name to sample from.
+        stats (dict, optional): The **PuzzleStats** of attempted puzzles, by
+            content hash.
+    """
+
+    def __init__(self, puzzles, stats=None):
+        self.stats = dict(stats) if stats else {}
+        self._digests = dict(puzzles)
+        self._names = list(self._digests)
+        self._slots = {name: slot for slot, name in enumerate(self._names)}
+        self._weights = [
+            attempt_weight(self.stats.get(self._digests[name])) for name in self._names
+        ]
+        self._free = []
+        self._lock = threading.Lock()
+
+        # Build the (1-based) tree in linear time.
+        self._tree = [0.0] + self._weights
+        for index in range(1, len(self._tree)):
+            parent = index + (index & -index)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[index]
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, name):
+        return name in self._slots
+
+    def weight(self, name):
+        return self._weights[self._slots[name]]
+
+    def sample(self, rng=random):
+        """Return a puzzle name (raises **IndexError** if there are none)."""
+        with self._lock:
+            size = len(self._weights)
+            total = self._prefix(size)
+            if not self._slots or total <= 0.0:
+                raise IndexError("There are no puzzles to sample.")
+
+            # Descend the tree to the first slot whose prefix sum exceeds
+            # the target (zero-weight free slots are never chosen).
+            target = rng.random() * total
+            index, step = 0, 1 << size.bit_length()
+            while step:
+                if index + step <= size and self._tree[index + step] <= target:
+                    index += step
+                    target -= self._tree[index]
+                step >>= 1
+
+            # Rounding may overshoot the last puzzle.
+            while index >= size or self._names[index] is None:
+                index = (index - 1) % size
+            return self._names[index]
+
+    def add(self, name, digest):
+        """
+        Add a puzzle, weighted by its stats. A puzzle already present whose
+        content has changed takes the stats of its new content.
+        """
+        with self._lock:
+            if self._digests.get(name) == digest:
+                return
+            self._digests[name] = digest
+            weight = attempt_weight(self.stats.get(digest))
+
+            if name in self._slots:
+                self._update(self._slots[name], weight)
+                return
+
+            if self._free:
+                slot = self._free.pop()
+                self._names[slot] = name
+                self._slots[name] = slot
+                self._update(slot, weight)
+                return
+
+            # Appending a slot only requires the node which covers it.
+            slot = len(self._weights)
+            self._names.append(name)
+            self._slots[name] = slot
+            self._weights.append(weight)
+            index = slot + 1
+            node = weight + self._prefix(slot) - self._prefix(index - (index & -index))
+            self._tree.append(node)
+
+    def remove(self, name):
+        """Remove a puzzle (if present). Its stats are kept."""
+        with self._lock:
+            slot = self._slots.pop(name, None)
+            if slot is None:
+                return
+            del self._digests[name]
+            self._update(slot, 0.0)
+            self._names[slot] = None
+            self._free.append(slot)
+
+    def record(self, attempt):
+        """Update the stats and weight of a puzzle from a new **Attempt**."""
+        with self._lock:
+            stats = self.stats.get(attempt.digest)
+            duration = float(sum(attempt.timings))
+            if stats is None:
+                stats = PuzzleStats(0, 0, 0.0, None, True)
+
+            attempts = stats.attempts + 1
+            self.stats[attempt.digest] = PuzzleStats(
+                attempts=attempts,
+                correct=stats.correct + int(bool(attempt.correct)),
+                mean_time=stats.mean_time + (duration - stats.mean_time) / attempts,
+                last_time=time.time(),
+                last_correct=bool(attempt.correct),
+            )
+
+            # the puzzle may have been edited since the attempt began
+            if self._digests.get(attempt.puzzle) == attempt.digest:
+                slot = self._slots[attempt.puzzle]
+                self._update(slot, attempt_weight(self.stats[attempt.digest]))
+
+    def _update(self, slot, weight):
+        delta = weight - self._weights[slot]
+        self._weights[slot] = weight
+        index = slot + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, count):
+        """Return the total weight of the first count slots."""
+        total = 0.0
+        while count > 0:
+            total += self._tree[count]
+            count -= count & -count
+        return total
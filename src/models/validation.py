@@ -0,0 +1,153 @@
+from models.rules import RULES_VERSION
+from constants import MODULE_DIRECTORY, VALIDATION_FILE
+import hashlib
+import sqlite3
+import os
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS puzzles (
+    filename TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    valid INTEGER NOT NULL
+);
+"""
+
+
+def digest(text):
+    """Return the content hash of the given file text."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ValidationIndex:
+    """
+    A per-module record of puzzle validation results, keyed by the content
+    hash of each puzzle file. The index is tied to a hash of the module
+    metadata, the rule set and **RULES_VERSION**; if any of them changes then
+    every record is discarded. A puzzle file whose hash matches its record
+    need not be validated again.
+
+    The records are kept in an SQLite file, read once by **load**. Only the
+    records changed since the last **save** are written, so that saving a
+    puzzle costs the same in a module of any size. The file is only a cache:
+    one which cannot be read is rebuilt.
+    """
+
+    def __init__(self, modulename, metadata_digest, records=None):
+        self.modulename = modulename
+        self.metadata_digest = metadata_digest
+        self.records = {} if records is None else records
+        self._changed = set()
+        self._reset = False
+
+    @staticmethod
+    def load(modulename, metadata_text, rules):
+        """
+        Args:
+            modulename (str): Module the index belongs to.
+            metadata_text (str): Contents of the module metadata file.
+            rules (list): The rule set the puzzles are validated against.
+        """
+        rulenames = " ".join([rule.__name__ for rule in rules])
+        version = "rules v" + str(RULES_VERSION)
+        metadata_digest = digest(metadata_text + rulenames + version)
+
+        try:
+            db = _connect(ValidationIndex._filepath(modulename))
+            try:
+                row = db.execute("SELECT value FROM meta WHERE key = 'metadata'")
+                row = row.fetchone()
+                rows = db.execute("SELECT filename, hash, valid FROM puzzles")
+                records = {f: (puzzle_digest, bool(v)) for f, puzzle_digest, v in rows}
+            finally:
+                db.close()
+        except sqlite3.Error:
+            row, records = None, {}
+
+        if row is not None and row[0] == metadata_digest:
+            return ValidationIndex(modulename, metadata_digest, records)
+
+        index = ValidationIndex(modulename, metadata_digest)
+        index._reset = True
+        return index
+
+    def lookup(self, filename, puzzle_digest):
+        """Return the recorded result for the file content, or **None**."""
+        record = self.records.get(filename)
+        if record is None or record[0] != puzzle_digest:
+            return None
+        return record[1]
+
+    def record(self, filename, puzzle_digest, valid):
+        if self.records.get(filename) != (puzzle_digest, valid):
+            self.records[filename] = (puzzle_digest, valid)
+            self._changed.add(filename)
+
+    def discard(self, filename):
+        if self.records.pop(filename, None) is not None:
+            self._changed.add(filename)
+
+    def prune(self, filenames):
+        """Discard records of puzzle files no longer on file."""
+        for filename in set(self.records) - set(filenames):
+            self.discard(filename)
+
+    def save(self):
+        """Write the records changed since the last save (if any)."""
+        if not self._changed and not self._reset:
+            return
+
+        upserts, deletes = [], []
+        for filename in self._changed:
+            record = self.records.get(filename)
+            if record is None:
+                deletes.append((filename,))
+            else:
+                upserts.append((filename, record[0], int(record[1])))
+
+        filepath = ValidationIndex._filepath(self.modulename)
+        try:
+            db = _connect(filepath)
+        except sqlite3.DatabaseError:
+            # an unreadable file is rebuilt from the records in memory
+            os.remove(filepath)
+            db = _connect(filepath)
+            self._reset = True
+
+        try:
+            with db:
+                if self._reset:
+                    db.execute("DELETE FROM puzzles")
+                    db.execute(
+                        "INSERT OR REPLACE INTO meta VALUES ('metadata', ?)",
+                        (self.metadata_digest,),
+                    )
+                    upserts = [
+                        (filename, puzzle_digest, int(valid))
+                        for filename, (puzzle_digest, valid) in self.records.items()
+                    ]
+                    deletes = []
+                db.executemany(
+                    "INSERT OR REPLACE INTO puzzles VALUES (?, ?, ?)", upserts
+                )
+                db.executemany("DELETE FROM puzzles WHERE filename = ?", deletes)
+        finally:
+            db.close()
+
+        self._changed = set()
+        self._reset = False
+
+    @staticmethod
+    def _filepath(modulename):
+        return MODULE_DIRECTORY + modulename + VALIDATION_FILE
+
+
+def _connect(filepath):
+    # The index is a cache, so writes need not survive a crash. Keeping the
+    # journal in memory also leaves the module directory (and so the module
+    # index) untouched when records are written.
+    db = sqlite3.connect(filepath)
+    db.execute("PRAGMA journal_mode=MEMORY")
+    db.execute("PRAGMA synchronous=OFF")
+    db.executescript(SCHEMA)
+    return db
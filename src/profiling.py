@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from constants import STARTUP_LOG
+import datetime
+import time
+import sys
+import os
+
+
+class PhaseTimer:
+    """
+    Times consecutive phases of a process (e.g. application startup). Each
+    **mark** closes the phase running since the previous mark (or since the
+    timer was created). Repeated marks of the same phase accumulate.
+    """
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self._start = time.perf_counter()
+        self._last = self._start
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self._start
+
+    def report(self, outfile=sys.stdout):
+        """Print the phase timings (in milliseconds)."""
+        rows = list(self.phases.items()) + [("total", self.total)]
+        width = max([len(phase) for phase, _ in rows])
+        for phase, elapsed in rows:
+            print(phase.ljust(width), "{:8.1f} ms".format(elapsed * 1000), file=outfile)
+        outfile.flush()
+
+    def log(self, filepath=STARTUP_LOG):
+        """Append the phase timings as a line of a CSV file, to track them over time."""
+        newfile = not os.path.exists(filepath)
+        with open(filepath, "a") as outfile:
+            if newfile:
+                outfile.write(",".join(["date", "frozen"] + list(self.phases)) + "\n")
+            row = [datetime.datetime.now().isoformat(timespec="seconds")]
+            row += [str(int(getattr(sys, "frozen", False)))]
+            row += ["{:.1f}".format(elapsed * 1000) for elapsed in self.phases.values()]
+            outfile.write(",".join(row) + "\n")
+
+
+def resident_memory():
+    """Return the resident memory of this process in bytes (**None** if unknown)."""
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/statm", "r") as infile:
+            return int(infile.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    elif sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        psapi = ctypes.windll.psapi
+        if psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    return None
@@ -10,7 +10,7 @@ from PyQt5.QtWidgets import (
     QStackedWidget,
 )
 from PyQt5.QtCore import Qt, pyqtSignal
-from viewcontrols.gamepage.puyo import PuyoGridView
+from viewcontrols.gamepage.puyo import PuyoCanvasView
 from viewcontrols.gamepage.game import GameView
 from viewcontrols.qtutils import deleteItemsOfLayout
 
@@ -29,7 +29,7 @@ class DrawpileElementView(QHBoxLayout):
         indexlabel.setFixedWidth(25)
         indexlabel.setAlignment(Qt.AlignCenter)
 
-        puyos = PuyoGridView(graphics, isframed=True)
+        puyos = PuyoCanvasView(graphics, isframed=True)
         puyos.rightclick.connect(lambda pos: self.rightclick.emit(index, pos))
         puyos.leftclick.connect(lambda pos: self.leftclick.emit(index, pos))
 
@@ -113,7 +113,7 @@ class PuzzleDefineView(QWidget):
         drawpile_view.rightclick.connect(self.rightclick_drawpile)
         drawpile_view.leftclick.connect(self.leftclick_drawpile)
 
-        board_view = PuyoGridView(board_graphics, isframed=True)
+        board_view = PuyoCanvasView(board_graphics, isframed=True)
         board_view.rightclick.connect(self.rightclick_board)
         board_view.leftclick.connect(self.leftclick_board)
 
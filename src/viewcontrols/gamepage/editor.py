@@ -1,4 +1,4 @@
-from models import grid2graphics, Puyo
+from models import grid2graphics, Puyo, RuleEvaluator
 from viewcontrols.gamepage.edit import EditorView  # view
 from viewcontrols.gamepage.player import PlayVC  # sub-view-controller
 from viewcontrols.qtutils import ErrorPopup
@@ -9,6 +9,7 @@ class EditorVC:
     def __init__(self, puzzle, skin, parent=None):
         self.skin = skin
         self.puzzle = puzzle
+        self.evaluator = RuleEvaluator(puzzle)
 
         board, drawpile = self._generatePuzzleDefineGraphics()
         hover = grid2graphics(skin, puzzle.hover)
@@ -31,41 +32,63 @@ class EditorVC:
     def bindDefineView(self):
         puzzle = self.puzzle
         view = self.view.defineview
+        evaluator = self.evaluator
 
+        # Each edit marks the region it changed so only the affected rules re-run.
         def update(func):
             def decorated(*args):
                 func(*args)
-                puzzle.apply_rules(force=True)
+                evaluator.evaluate(force=True)
                 view.setGraphics(*self._generatePuzzleDefineGraphics())
 
             return decorated
 
+        def nextPuyo(puyo):
+            return puyo.next_(cond=lambda p: p is not Puyo.NONE)
+
+        @update
+        def changeBoardElem(pos):
+            puzzle.board[pos] = nextPuyo(puzzle.board[pos])
+            evaluator.mark_board(pos)
+
+        @update
+        def clearBoardElem(pos):
+            puzzle.board[pos] = Puyo.NONE
+            evaluator.mark_board(pos)
+
         @update
-        def changeGridElem(grid, pos):
-            grid[pos] = grid[pos].next_(cond=lambda p: p is not Puyo.NONE)
+        def changeMoveElem(index, pos):
+            grid = puzzle.moves[index].grid
+            grid[pos] = nextPuyo(grid[pos])
+            evaluator.mark_move(index)
 
         @update
-        def clearGridElem(grid, pos):
-            grid[pos] = Puyo.NONE
+        def clearMoveElem(index, pos):
+            puzzle.moves[index].grid[pos] = Puyo.NONE
+            evaluator.mark_move(index)
 
         @update
         def insertDrawpileElem(index):
             puzzle.new_move(index + 1)
+            evaluator.insert_move(index + 1)
 
         @update
         def deleteDrawpileElem(index):
             del puzzle.moves[index]
+            evaluator.delete_move(index)
 
         @update
         def clearBoard():
             puzzle.board.reset()
+            evaluator.mark_board()
 
         @update
         def resetDrawpile():
             puzzle.moves.clear()
+            evaluator.mark_drawpile()
 
         def startSolution():
-            if puzzle.apply_rules():
+            if evaluator.evaluate():
                 self.view.centralWidget().setCurrentWidget(self.view.solverview)
                 self.game_controller.reset()
             else:
@@ -78,14 +101,10 @@ class EditorVC:
                     )
                 )
 
-        view.leftclick_board.connect(lambda pos: changeGridElem(puzzle.board, pos))
-        view.rightclick_board.connect(lambda pos: clearGridElem(puzzle.board, pos))
-        view.leftclick_drawpile.connect(
-            lambda idx, pos: changeGridElem(puzzle.moves[idx].grid, pos)
-        )
-        view.rightclick_drawpile.connect(
-            lambda idx, pos: clearGridElem(puzzle.moves[idx].grid, pos)
-        )
+        view.leftclick_board.connect(changeBoardElem)
+        view.rightclick_board.connect(clearBoardElem)
+        view.leftclick_drawpile.connect(changeMoveElem)
+        view.rightclick_drawpile.connect(clearMoveElem)
         view.insert.connect(insertDrawpileElem)
         view.delete.connect(deleteDrawpileElem)
         view.reset.connect(resetDrawpile)
@@ -99,6 +118,7 @@ class EditorVC:
         def exitSolver():
             self.view.centralWidget().setCurrentWidget(self.view.defineview)
             model.board.revert()
+            self.evaluator.mark_all()
 
         def savePuzzle():
             # check if all moves have been input
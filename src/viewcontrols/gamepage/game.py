@@ -5,11 +5,11 @@ from PyQt5.QtWidgets import (
     QLabel,
     QMainWindow,
     QSizePolicy,
+    QSlider,
     QStackedWidget,
 )
 from PyQt5.QtCore import pyqtSignal, Qt
-from viewcontrols.gamepage.puyo import PuyoGridView
-from viewcontrols.qtutils import deleteItemsOfLayout
+from viewcontrols.gamepage.puyo import PuyoCanvasView
 
 
 class GameView(QWidget):
@@ -20,6 +20,7 @@ class GameView(QWidget):
     pressRight = pyqtSignal()
     pressLeft = pyqtSignal()
     pressSpace = pyqtSignal()
+    pressS = pyqtSignal()
 
     def __init__(
         self,
@@ -31,9 +32,13 @@ class GameView(QWidget):
     ):
         super().__init__(parent)
 
-        self.board = PuyoGridView(board_graphics, isframed=True, parent=self)
-        self.hover = PuyoGridView(hover_graphics, isframed=False, parent=self)
+        self.board = PuyoCanvasView(board_graphics, isframed=True, parent=self)
+        self.hover = PuyoCanvasView(hover_graphics, isframed=False, parent=self)
         self.drawpile = QVBoxLayout()
+        self.drawpile_pool = []
+        self.remaining = QLabel(parent=self)
+        self.drawpile.addStretch()
+        self.drawpile.addWidget(self.remaining)
 
         leftlayout = QVBoxLayout()
         leftlayout.addWidget(self.hover)
@@ -56,12 +61,20 @@ class GameView(QWidget):
         self.board.setGraphics(board_graphics)
         self.hover.setGraphics(hover_graphics)
 
-        deleteItemsOfLayout(self.drawpile)
-        for drawpile_gfx in drawpile_graphicslist:
-            self.drawpile.addWidget(PuyoGridView(drawpile_gfx, isframed=False))
+        # The drawpile views are pooled and updated in place; extras are hidden.
+        for index, drawpile_gfx in enumerate(drawpile_graphicslist):
+            if index < len(self.drawpile_pool):
+                self.drawpile_pool[index].setGraphics(drawpile_gfx)
+            else:
+                view = PuyoCanvasView(drawpile_gfx, isframed=False, parent=self)
+                self.drawpile.insertWidget(index, view)
+                self.drawpile_pool.append(view)
+            self.drawpile_pool[index].show()
 
-        self.drawpile.addStretch()
-        self.drawpile.addWidget(QLabel(str(nremaining) + " remaining."))
+        for view in self.drawpile_pool[len(drawpile_graphicslist) :]:
+            view.hide()
+
+        self.remaining.setText(str(nremaining) + " remaining.")
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_X:
@@ -78,10 +91,29 @@ class GameView(QWidget):
             self.pressLeft.emit()
         elif event.key() == Qt.Key_Space:
             self.pressSpace.emit()
+        elif event.key() == Qt.Key_S:
+            self.pressS.emit()
 
         super().keyPressEvent(event)
 
 
+class MoveScrubber(QSlider):
+    """A slider to jump to the board after any number of moves."""
+
+    def __init__(self, parent=None):
+        super().__init__(Qt.Horizontal, parent)
+        self.setFocusPolicy(Qt.NoFocus)
+        self.setPageStep(1)
+        self.setTickPosition(QSlider.TicksBelow)
+
+    def setPosition(self, index, nmoves):
+        """Move the slider without emitting **valueChanged**."""
+        self.blockSignals(True)
+        self.setMaximum(nmoves)
+        self.setValue(index)
+        self.blockSignals(False)
+
+
 class SoloGameView(QMainWindow):
     def __init__(
         self,
@@ -101,9 +133,12 @@ class SoloGameView(QMainWindow):
             parent=parent,
         )
 
+        self.scrubber = MoveScrubber()
+
         widget = QWidget()
         layout = QVBoxLayout(widget)
         layout.addWidget(self.gameview)
+        layout.addWidget(self.scrubber)
 
         label = QLabel("Reviewing: " + text)
         label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -135,17 +170,23 @@ class PairedGameView(QWidget):
         self.label1.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.label2.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
-        top_layout = QHBoxLayout(self)
+        # A single scrubber moves both views together.
+        self.scrubber = MoveScrubber(parent=self)
+
+        top_layout = QVBoxLayout(self)
+        views_layout = QHBoxLayout()
+        top_layout.addLayout(views_layout)
+        top_layout.addWidget(self.scrubber)
 
         left_layout = QVBoxLayout()
         left_layout.addWidget(self.gameview1)
         left_layout.addWidget(self.label1)
-        top_layout.addLayout(left_layout)
+        views_layout.addLayout(left_layout)
 
         right_layout = QVBoxLayout()
         right_layout.addWidget(self.gameview2)
         right_layout.addWidget(self.label2)
-        top_layout.addLayout(right_layout)
+        views_layout.addLayout(right_layout)
 
         self.setCorrect(True)
 
@@ -186,6 +227,8 @@ class TestGameView(QWidget):
 
 
 class TestWindow(QMainWindow):
+    closed = pyqtSignal()
+
     def __init__(
         self,
         board1,
@@ -216,3 +259,7 @@ class TestWindow(QMainWindow):
         self.setCentralWidget(QStackedWidget())
         self.centralWidget().addWidget(self.test)
         self.centralWidget().addWidget(self.review)
+
+    def closeEvent(self, event):
+        self.closed.emit()
+        super().closeEvent(event)
@@ -1,9 +1,16 @@
-from models import Direc, PopState, grid2graphics
-from copy import deepcopy
+from models import Direc, RuleEvaluator, grid2graphics
+from models.graphic import Graphics
+from models.render import resting_frame, chain_frames, replay_frames
+from models.results import Attempt, grade
+from models.sampler import PuzzleSampler
+from collections import namedtuple
 from PyQt5.QtCore import QTimer, Qt, QObject, pyqtSignal
-from constants import POP_SPEED
+from constants import DRAWPILE_VISIBLE, TEST_PREFETCH, INPUT_TICK
 from viewcontrols.gamepage.game import SoloGameView, TestWindow
-import random
+from viewcontrols.gamepage.scheduler import FrameScheduler
+import threading
+import queue
+import time
 from viewcontrols.qtutils import ErrorPopup
 
 """
@@ -16,16 +23,21 @@ function by splicing multiple subcontrollers together.
 """
 
 
+def drawpile_graphics(skin, moves, start):
+    """Return the graphics of the visible window of the drawpile."""
+    window = moves[start : start + DRAWPILE_VISIBLE]
+    return [grid2graphics(skin, move.grid) for move in window]
+
+
 def animate(func):
     def wrapper(self):
-        if not self.timer.isActive() and not self.lock:
+        if not self.isBusy():
             try:
                 func(self)
-                self.puzzle.apply_rules(force=True)
+                self.evaluator.mark_board()
+                self.evaluator.evaluate(force=True)
                 self.animate()
                 self.process_complete.emit()
-                self.lock = self.prelock
-                self.prelock = False
             except IndexError:
                 pass
 
@@ -34,166 +46,178 @@ def animate(func):
 
 class GameVC(QObject):
     process_complete = pyqtSignal()
-    animation_start = pyqtSignal()
-    animation_end = pyqtSignal()
 
     def __init__(self, skin, puzzle, view):
         super().__init__()
-        self.lock = False
-        self.prelock = False
-        self.haslock = False
         self.skin = skin
         self.puzzle = puzzle
         self.view = view
         self.draw_index = 0
-        self.animate()
-
-    def setLock(self):
-        self.prelock = True
 
-    def releaseLock(self):
-        self.lock = False
+        # Views which follow this one (see PlayVC.addFollower).
+        self.followers = []
 
-    def setPuzzle(self, puzzle):
-        self.puzzle = puzzle
-        self.reset()
+        self.scheduler = FrameScheduler(self.showFrame, parent=self.view)
+        view.pressS.connect(self.skipAnimation)
+        self.evaluator = RuleEvaluator(puzzle)
+        self.replay = None
 
-    def reset(self):
-        self.draw_index = 0
         self.animate()
-        self.view.setFocus()
 
-    def animate(self, popstate=PopState.PREPOP):
-        # Create a timer for the pop animation.
-        timer = QTimer(self.view)
-        timer.setSingleShot(True)
-        timer.setInterval(POP_SPEED * 1000)
-        self.timer = timer
-
-        # Check for a pop and animate (recursively).
-        popset = self.puzzle.board.pop_set(self.puzzle.module.pop_limit)
-        if popset:
-            if not self.haslock:
-                self.animation_start.emit()
-                self.haslock = True
-
-            # Empty the hover grid.
-            self.puzzle.hover.assign_move(None)
-            hover_gfx = grid2graphics(self.skin, self.puzzle.hover)
-
-            # Get the visible drawpile.
-            draw_gfx = [grid2graphics(self.skin, mv.grid) for mv in self.puzzle.moves]
-            draw_gfx = draw_gfx[self.draw_index : self.draw_index + 2]
-
-            # Calculate remaining.
-            nremaining = len(self.puzzle.moves) - self.draw_index
-
-            # Get the board graphics.
-            board_gfx = grid2graphics(
-                skin=self.skin,
-                grid=self.puzzle.board,
-                ghosts=set(),
-                pops=popset,
-                popstate=popstate,
-            )
-
-            self.view.setGraphics(board_gfx, draw_gfx, hover_gfx, nremaining)
-
-            # Start the timer to update the animation at the next pop state.
-            self.timer.timeout.connect(lambda: self.animate(popstate._next()))
-            self.timer.start()
-
-            # If at the final pop state in the animation, execute the pop.
-            if popstate is PopState.POPLATER:
-                self.puzzle.board.execute_pop(self.puzzle.module.pop_limit)
+    def isBusy(self):
+        """Return **True** while this or any following view is animating."""
+        return any([vc.scheduler.isBusy() for vc in [self] + self.followers])
 
-        else:
-            # Assign a move, if available, to the hover grid.
-            try:
-                move = self.puzzle.moves[self.draw_index]
-            except IndexError:
-                move = None
-
-            self.puzzle.hover.assign_move(move)
-            hover_gfx = grid2graphics(self.skin, self.puzzle.hover)
-
-            # Get the visible drawpile.
-            draw_gfx = [grid2graphics(self.skin, mv.grid) for mv in self.puzzle.moves]
-            draw_gfx = draw_gfx[self.draw_index + 1 : self.draw_index + 3]
-
-            # Calculate remaining.
-            nremaining = len(self.puzzle.moves) - self.draw_index
+    def setPuzzle(self, puzzle, frames=None):
+        """
+        Play the given puzzle, optionally starting from prepared frames (see
+        **animate**) of its board, already settled.
+        """
+        self.puzzle = puzzle
+        self.reset(frames)
 
-            # Find the ghosts.
-            if move is not None:
-                future_board = deepcopy(self.puzzle.board)
-                future_board.apply_move(move)
-                ghosts = future_board - self.puzzle.board
-            else:
-                ghosts = set()
+    def reset(self, frames=None):
+        self.draw_index = 0
+        self.evaluator = RuleEvaluator(self.puzzle)
+        self.replay = None
+        if frames is None:
+            self.animate()
+        else:
+            self.scheduler.play(frames)
+        self.view.setFocus()
 
-            # Get the board graphics.
-            board_gfx = grid2graphics(self.skin, self.puzzle.board, ghosts)
+    def animate(self):
+        """
+        Resolve any chain on the board up front into a timeline of frames,
+        one for each pop state of each chain step. The final frame shows the
+        settled board with the next move hovering above it.
+        """
+        steps = self.puzzle.board.resolve_chain(self.puzzle.module.pop_limit)
+        frames = chain_frames(self.puzzle, steps, self.draw_index)
+        frames.append(resting_frame(self.puzzle, self.draw_index))
+        self.scheduler.play(frames)
+
+    def showFrame(self, frame):
+        self.view.setGraphics(
+            Graphics(self.skin, frame.board),
+            [Graphics(self.skin, tiles) for tiles in frame.drawpile],
+            Graphics(self.skin, frame.hover),
+            frame.nremaining,
+        )
 
-            self.view.setGraphics(board_gfx, draw_gfx, hover_gfx, nremaining)
-            self.animation_end.emit()
-            self.haslock = False
+    def jumpTo(self, index):
+        """
+        Show the settled board after the given number of moves at once (and
+        likewise on any following views). The board after each move and its
+        frame are replayed once and then cached until the puzzle changes.
+        """
+        for follower in self.followers:
+            follower.jumpTo(index)
+
+        if self.replay is None:
+            self.replay = replay_frames(self.puzzle)
+        states, frames = self.replay
+
+        self.draw_index = max(0, min(index, len(states) - 1))
+        self.puzzle.board.restore(states, self.draw_index)
+        self.scheduler.play([frames[self.draw_index]])
+        self.process_complete.emit()
+
+    def skipAnimation(self):
+        """
+        Jump straight to the final frame of an ongoing animation (and likewise
+        on any following views).
+        """
+        for follower in self.followers:
+            follower.skipAnimation()
+        self.scheduler.skip()
 
 
 class PlayVC(GameVC):
-    pressUp_xstrap = pyqtSignal()
-    pressDown_xstrap = pyqtSignal()
-
     def __init__(self, skin, puzzle, view, revertable=True, shiftable=True):
-        view.pressX.connect(self.rotateRight)
-        view.pressZ.connect(self.rotateLeft)
-        view.pressRight.connect(self.shiftRight)
-        view.pressLeft.connect(self.shiftLeft)
+        view.pressX.connect(lambda: self.queueInput(PlayVC._rotateRight))
+        view.pressZ.connect(lambda: self.queueInput(PlayVC._rotateLeft))
+        view.pressRight.connect(lambda: self.queueInput(PlayVC._shiftRight))
+        view.pressLeft.connect(lambda: self.queueInput(PlayVC._shiftLeft))
 
         self.revertable = revertable
         self.shiftable = shiftable
         super().__init__(skin, puzzle, view)
 
-        view.pressUp.connect(self.xstrap_signal(self.pressUp_xstrap))
-        view.pressDown.connect(self.xstrap_signal(self.pressDown_xstrap))
+        # Shifts and rotations (e.g. from a held key) are queued and applied
+        # together once per tick: the rules are run and the view is rendered
+        # once per tick rather than once per key event.
+        self.pending = []
+        self.input_timer = QTimer(view)
+        self.input_timer.setSingleShot(True)
+        self.input_timer.setInterval(int(INPUT_TICK * 1000))
+        self.input_timer.timeout.connect(self.applyInput)
+
         view.pressUp.connect(self.revertMove)
         view.pressDown.connect(self.makeMove)
 
-    def xstrap_signal(self, signal):
-        def xstrap():
-            if not self.timer.isActive():
-                signal.emit()
-
-        return xstrap
+    def addFollower(self, follower):
+        """
+        Make and revert moves on the follower together with this view. Input
+        is ignored until both views have finished animating.
+        """
+        self.followers.append(follower)
 
-    @animate
-    def rotateRight(self):
-        if not self.shiftable:
+    def queueInput(self, edit):
+        if not self.shiftable or self.isBusy():
             return
+        self.pending.append(edit)
+        if not self.input_timer.isActive():
+            self.input_timer.start()
+
+    def applyInput(self):
+        if self.flushInput():
+            self.evaluator.evaluate(force=True)
+            self.scheduler.play([resting_frame(self.puzzle, self.draw_index)])
+            self.process_complete.emit()
+
+    def flushInput(self):
+        """
+        Apply the queued shifts and rotations in order to the current move,
+        refitting it to the board after each, as a single edit of the move.
+        Return whether the move was edited.
+        """
+        self.input_timer.stop()
+        edits, self.pending = self.pending, []
+        if not edits or self.isBusy() or self.draw_index >= len(self.puzzle.moves):
+            return False
+
         move = self.puzzle.moves[self.draw_index]
+        for edit in edits:
+            edit(move)
+            move = self.puzzle.hover.fit_move(move)
+        self.puzzle.moves[self.draw_index] = move
+        self.evaluator.mark_move(self.draw_index)
+        self.replay = None
+
+        return True
+
+    @staticmethod
+    def _rotateRight(move):
         move.direc = Direc.rotate_cw(move.direc)
 
-    @animate
-    def rotateLeft(self):
-        if not self.shiftable:
-            return
-        move = self.puzzle.moves[self.draw_index]
+    @staticmethod
+    def _rotateLeft(move):
         move.direc = Direc.rotate_ccw(move.direc)
 
-    @animate
-    def shiftRight(self):
-        if not self.shiftable:
-            return
-        self.puzzle.moves[self.draw_index].col += 1
+    @staticmethod
+    def _shiftRight(move):
+        move.col += 1
 
-    @animate
-    def shiftLeft(self):
-        if not self.shiftable:
-            return
-        self.puzzle.moves[self.draw_index].col -= 1
+    @staticmethod
+    def _shiftLeft(move):
+        move.col -= 1
 
     @animate
     def makeMove(self):
+        self.flushInput()
+        for follower in self.followers:
+            follower.makeMove()
         self.puzzle.board.apply_move(self.puzzle.moves[self.draw_index])
         self.draw_index += 1
 
@@ -201,6 +225,9 @@ class PlayVC(GameVC):
     def revertMove(self):
         if not self.revertable:
             return
+        self.flushInput()
+        for follower in self.followers:
+            follower.revertMove()
         if self.draw_index > 0:
             self.draw_index -= 1
             self.puzzle.board.revert_move()
@@ -209,7 +236,7 @@ class PlayVC(GameVC):
 class ReviewVC(GameVC):
     def __init__(self, skin, puzzle, text, parent=None):
         board = grid2graphics(skin, puzzle.board)
-        drawpile = [grid2graphics(skin, move.grid) for move in puzzle.moves]
+        drawpile = drawpile_graphics(skin, puzzle.moves, 0)
         hover = grid2graphics(skin, puzzle.hover)
 
         win = SoloGameView(board, drawpile, hover, 0, text, parent)
@@ -218,9 +245,16 @@ class ReviewVC(GameVC):
         win.gameview.pressUp.connect(self.revertMove)
         win.gameview.pressDown.connect(self.makeMove)
 
-        win.show()
+        win.scrubber.valueChanged.connect(self.jumpTo)
+        self.process_complete.connect(self.updateScrubber)
 
         self.win = win
+        self.updateScrubber()
+
+        win.show()
+
+    def updateScrubber(self):
+        self.win.scrubber.setPosition(self.draw_index, len(self.puzzle.moves))
 
     @animate
     def makeMove(self):
@@ -234,28 +268,92 @@ class ReviewVC(GameVC):
             self.puzzle.board.revert_move()
 
 
+# A test instance ready to be played: the puzzle name and content hash (see
+# PuzzleModule.puzzle_digest), the response puzzle (to be played), the solution
+# puzzle, and the opening frames of the response (any chain left by the skipped
+# moves, then the resting board).
+PreparedTest = namedtuple("PreparedTest", "name, digest, response, solution, frames")
+
+
+class TestPrefetcher:
+    """
+    Keeps a small queue of prepared tests, built on a background thread while
+    the current test is being played. The puzzle of each test is taken by
+    **snapshot** on the main thread (as **get** is called), so that the thread
+    only works on its own puzzle sessions. Any error raised while taking or
+    preparing a test is raised again by **get**.
+    """
+
+    def __init__(self, snapshot, prepare, size=TEST_PREFETCH):
+        self.snapshot = snapshot
+        self.requests = queue.Queue()
+        self.queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(prepare,), daemon=True)
+        self._thread.start()
+
+        for _ in range(size):
+            self._submit()
+
+    def get(self):
+        """Return the next prepared test and start preparing another."""
+        test = self.queue.get()
+        self._submit()
+        if isinstance(test, Exception):
+            raise test
+        return test
+
+    def stop(self):
+        self._stop.set()
+        self.requests.put(None)
+
+    def _submit(self):
+        try:
+            self.requests.put(self.snapshot())
+        except Exception as err:
+            self.requests.put(err)
+
+    def _run(self, prepare):
+        while True:
+            request = self.requests.get()
+            if request is None or self._stop.is_set():
+                return
+
+            try:
+                test = request if isinstance(request, Exception) else prepare(*request)
+            except Exception as err:
+                test = err
+            self.queue.put(test)
+
+
 class TesterVC:
-    def __init__(self, skin, module, nmoves, nreview, parent=None):
+    def __init__(
+        self, skin, module, modulename, nmoves, nreview, parent=None, results=None
+    ):
         self.skin = skin
         self.module = module
+        self.modulename = modulename
         self.nmoves = nmoves
         self.nreview = nreview
+        self.results = results
+
+        # Puzzles are drawn favoring those recently failed (see PuzzleSampler).
+        stats = results.stats(modulename) if results is not None else {}
+        digests = {name: module.puzzle_digest(name) for name in module.puzzles}
+        self.sampler = PuzzleSampler(digests, stats)
 
         self.history = []
 
         # Initialize the window.
-        self.pickPuzzle()
+        test = self.prepareTest(*self.snapshotTest())
+        self.pickPuzzle(test)
         self.win = TestWindow(
             board1=grid2graphics(skin, self.puzzle_response.board),
-            drawpile1=[
-                grid2graphics(skin, move.grid) for move in self.puzzle_response.moves
-            ],
+            drawpile1=drawpile_graphics(skin, self.puzzle_response.moves, 0),
             hover1=grid2graphics(skin, self.puzzle_response.hover),
             nremain1=0,
             board2=grid2graphics(skin, self.puzzle_solution.board),
-            drawpile2=[
-                grid2graphics(skin, move.grid) for move in self.puzzle_solution.moves
-            ],
+            drawpile2=drawpile_graphics(skin, self.puzzle_solution.moves, 0),
             hover2=grid2graphics(skin, self.puzzle_solution.hover),
             nremain2=0,
             parent=parent,
@@ -265,6 +363,7 @@ class TesterVC:
         self.play_control = PlayVC(
             skin, self.puzzle_response, self.win.test.gameview, revertable=False
         )
+        self.play_control.setPuzzle(self.puzzle_response, test.frames)
         self.review_response_control = PlayVC(
             skin, self.puzzle_response, self.win.review.gameview1, shiftable=False
         )
@@ -272,25 +371,23 @@ class TesterVC:
             skin, self.puzzle_response, self.win.review.gameview2, shiftable=False
         )
 
-        self.review_solution_control.animation_start.connect(
-            self.review_response_control.setLock
-        )
-        self.review_solution_control.animation_end.connect(
-            self.review_response_control.releaseLock
-        )
-
-        # cross strap hack
+        # The solution view follows the moves made on the response view.
         self.win.review.gameview2.setFocusPolicy(Qt.NoFocus)
-        self.review_response_control.pressDown_xstrap.connect(
-            self.win.review.gameview2.pressDown
-        )
-        self.review_response_control.pressUp_xstrap.connect(
-            self.win.review.gameview2.pressUp
-        )
+        self.review_response_control.addFollower(self.review_solution_control)
+
+        self.play_control.process_complete.connect(self.recordTiming)
         self.win.test.gameview.pressSpace.connect(self.proceed2review)
         self.win.review.gameview1.pressSpace.connect(self.proceed2test)
 
         self.review_response_control.process_complete.connect(self.reviewEval)
+        self.review_response_control.process_complete.connect(self.updateScrubber)
+        self.win.review.scrubber.valueChanged.connect(
+            self.review_response_control.jumpTo
+        )
+
+        # Prepare the upcoming tests in the background.
+        self.prefetch = TestPrefetcher(self.snapshotTest, self.prepareTest)
+        self.win.closed.connect(self.prefetch.stop)
 
         self.win.show()
 
@@ -301,7 +398,7 @@ class TesterVC:
 
     def proceed2review(self):
         # check if there is an ongoing animation
-        if self.play_control.timer.isActive():
+        if self.play_control.isBusy():
             return
 
         # check to see if the test is complete
@@ -313,6 +410,7 @@ class TesterVC:
 
         # check to see if it is time to review
         self.puzzle_response.board.revert()
+        self.recordAttempt()
         self.history.append((self.puzzle_response, self.puzzle_solution))
 
         if len(self.history) == self.nreview:
@@ -321,14 +419,20 @@ class TesterVC:
             self.newTest()
 
     def newTest(self):
+        try:
+            test = self.prefetch.get()
+        except IndexError:
+            # every puzzle was removed from the module on disk
+            ErrorPopup("The module has no puzzles left to test.", parent=self.win)
+            self.win.close()
+            return
+
         self.win.centralWidget().setCurrentWidget(self.win.test)
-        self.pickPuzzle()
-        self.play_control.setPuzzle(self.puzzle_response)
+        self.pickPuzzle(test)
+        self.play_control.setPuzzle(self.puzzle_response, test.frames)
 
     def proceed2test(self):
-        if self.review_response_control.timer.isActive():
-            return
-        if self.review_solution_control.timer.isActive():
+        if self.review_response_control.isBusy():
             return
 
         if self.history:
@@ -342,21 +446,84 @@ class TesterVC:
         self.review_response_control.setPuzzle(self.puzzle_response)
         self.win.centralWidget().setCurrentWidget(self.win.review)
         self.reviewEval()
+        self.updateScrubber()
 
-    def pickPuzzle(self):
-        # pick a random puzzle with a random color map. apply moves as necessary
-        self.puzzle_response = deepcopy(
-            random.choice(list(self.module.puzzles.values()))
+    def updateScrubber(self):
+        control = self.review_response_control
+        self.win.review.scrubber.setPosition(
+            control.draw_index, len(control.puzzle.moves)
         )
 
-        self.puzzle_response.randomize_color()
-
-        while len(self.puzzle_response.moves) > self.nmoves:
-            self.puzzle_response.board.apply_move(self.puzzle_response.moves.pop(0))
-            self.puzzle_response.board._boardlist = []
-
-        self.puzzle_solution = deepcopy(self.puzzle_response)
-
-        for move in self.puzzle_response.moves:
+    def recordTiming(self):
+        # the time taken for each move, from the previous move (or the start)
+        now = time.perf_counter()
+        if self.play_control.draw_index > len(self.timings):
+            self.timings.append(now - self.last_move)
+            self.last_move = now
+
+    def recordAttempt(self):
+        correct, first_wrong = grade(self.puzzle_response, self.puzzle_solution)
+        attempt = Attempt(
+            module=self.modulename,
+            puzzle=self.puzzle_name,
+            digest=self.puzzle_digest,
+            cmap=self.puzzle_response.cmap,
+            nmoves=len(self.puzzle_response.moves),
+            timings=self.timings,
+            correct=correct,
+            first_wrong=first_wrong,
+        )
+        self.sampler.record(attempt)
+        if self.results is not None:
+            self.results.record(attempt)
+
+    def updatePuzzles(self, added, removed):
+        """Follow the puzzles added to (or removed from) the module on disk."""
+        for name in removed:
+            self.sampler.remove(name)
+        for name in added:
+            if name in self.module.puzzles:
+                self.sampler.add(name, self.module.puzzle_digest(name))
+
+    def pickPuzzle(self, test):
+        self.puzzle_name = test.name
+        self.puzzle_digest = test.digest
+        self.puzzle_response = test.response
+        self.puzzle_solution = test.solution
+        self.timings = []
+        self.last_move = time.perf_counter()
+
+    def snapshotTest(self):
+        """
+        Return the name, content hash and a session of a weighted random
+        puzzle. Must be called on the main thread, which owns the module
+        puzzles.
+        """
+        # a name may still be sampled as the module is reloaded, so retry
+        puzzle = None
+        while puzzle is None:
+            name = self.sampler.sample()
+            puzzle = self.module.puzzles.get(name)
+            if puzzle is None:
+                self.sampler.remove(name)
+        return name, self.module.puzzle_digest(name), puzzle.session()
+
+    def prepareTest(self, name, digest, puzzle_response):
+        """
+        Return a **PreparedTest** of a puzzle session (see **snapshotTest**).
+        May be called off the main thread: the session is not shared with
+        the main thread (bar read-only elements) and no widgets are touched.
+        """
+        # random color map. apply moves as necessary
+        puzzle_response.randomize_color()
+        steps = puzzle_response.trim_moves(self.nmoves)
+
+        puzzle_solution = puzzle_response.session()
+
+        for move in puzzle_response.moves:
             move.col = 2
             move.direc = Direc.NORTH
+
+        frames = chain_frames(puzzle_response, steps, 0)
+        frames.append(resting_frame(puzzle_response, 0))
+        return PreparedTest(name, digest, puzzle_response, puzzle_solution, frames)
@@ -1,45 +1,56 @@
-from PyQt5.QtWidgets import QAbstractButton, QFrame, QGridLayout, QSizePolicy
+from PyQt5.QtWidgets import QFrame
 from PyQt5.QtGui import QPixmap, QPainter, QImage
-from PyQt5.QtCore import Qt, pyqtSignal
-from functools import partial
+from PyQt5.QtCore import Qt, pyqtSignal, QRect, QSize
+from collections import OrderedDict
+from models.graphic import skin_tiles
+from constants import PIXMAP_CACHE_SIZE
+import numpy as np
 
 
-# A view of a single, clickable puyo. Displays an image with opacity.
-class PuyoView(QAbstractButton):
-    rightclick = pyqtSignal()
-    leftclick = pyqtSignal()
+# A bounded cache of the pixmaps of a single skin's tiles, shared by all views.
+# A fresh cache replaces the old one whenever the skin's tile table is rebuilt.
+class TilePixmaps:
+    _skins = {}
 
-    def __init__(self, image, opacity, parent=None):
-        super().__init__(parent)
-        self.setFocusPolicy(Qt.NoFocus)
-        self.setGraphic(image, opacity)
+    def __init__(self, table):
+        self.table = table
+        self._pixmaps = OrderedDict()
 
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.leftclick.emit()
-        if event.button() == Qt.RightButton:
-            self.rightclick.emit()
+    @staticmethod
+    def of(skin):
+        table = skin_tiles(skin)
+        pixmaps = TilePixmaps._skins.get(skin)
+        if pixmaps is None or pixmaps.table is not table:
+            pixmaps = TilePixmaps(table)
+            TilePixmaps._skins[skin] = pixmaps
+        return pixmaps
+
+    def __getitem__(self, tile):
+        pixmap = self._pixmaps.get(tile)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(tile)
+            return pixmap
 
-    def setGraphic(self, image, opacity):
+        image = self.table.images[self.table.lut[tile]]
         height, width, channel = image.shape
         qimg = QImage(
             image.tobytes(), width, height, channel * width, QImage.Format_RGBA8888,
         )
-        self.image = QPixmap(qimg)
-        self.opacity = opacity
-        self.update()
+        pixmap = QPixmap.fromImage(qimg)
 
-    def paintEvent(self, _):
-        painter = QPainter(self)
-        painter.setOpacity(self.opacity)
-        painter.drawPixmap(self.rect(), self.image)
+        self._pixmaps[tile] = pixmap
+        while len(self._pixmaps) > PIXMAP_CACHE_SIZE:
+            self._pixmaps.popitem(last=False)
 
-    def sizeHint(self):
-        return self.image.size()
+        return pixmap
 
 
-# A view of a grid of clickable puyos. May or may not be framed.
-class PuyoGridView(QFrame):
+# A view of a grid of clickable puyos, painted by a single widget. May or may
+# not be framed. Clicks are resolved to element positions by coordinate math.
+# The tile ids of the last frame are kept so that only the cells whose tile
+# changed are repainted; since tile ids encode adjacency, neighbors of an
+# edited cell are included.
+class PuyoCanvasView(QFrame):
     rightclick = pyqtSignal(tuple)
     leftclick = pyqtSignal(tuple)
 
@@ -51,20 +62,89 @@ class PuyoGridView(QFrame):
             self.setFrameShadow(QFrame.Plain)
             self.setLineWidth(2)
 
-        layout = QGridLayout(self)
-        layout.setSpacing(0)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setOriginCorner(Qt.BottomLeftCorner)
-
-        for gfx in graphics:
-            puyo = PuyoView(gfx.image, gfx.opacity, parent=self)
-            puyo.rightclick.connect(partial(self.rightclick.emit, gfx.pos))
-            puyo.leftclick.connect(partial(self.leftclick.emit, gfx.pos))
-            layout.addWidget(puyo, *gfx.pos)
+        self.pixmaps = TilePixmaps.of(graphics.skin)
+        self.tiles = graphics.tiles.copy()
+        height, width = self.pixmaps.table.images.shape[1:3]
+        self.tilesize = QSize(width, height)
 
-        self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        self.setFixedSize(self.sizeHint())
 
     def setGraphics(self, graphics):
-        for gfx in graphics:
-            puyo = self.layout().itemAtPosition(*gfx.pos).widget()
-            puyo.setGraphic(gfx.image, gfx.opacity)
+        pixmaps = TilePixmaps.of(graphics.skin)
+        if graphics.tiles.shape != self.tiles.shape:
+            self.tiles = graphics.tiles.copy()
+            self.setFixedSize(self.sizeHint())
+            self.update()
+        elif pixmaps is not self.pixmaps:
+            self.update()
+        else:
+            for pos in zip(*np.nonzero(graphics.tiles != self.tiles)):
+                self.update(self._cellRect(pos))
+
+        self.pixmaps = pixmaps
+        self.tiles = graphics.tiles.copy()
+
+    def mousePressEvent(self, event):
+        pos = self._cellAt(event.pos())
+        if pos is None:
+            return
+        elif event.button() == Qt.LeftButton:
+            self.leftclick.emit(pos)
+        elif event.button() == Qt.RightButton:
+            self.rightclick.emit(pos)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+
+        # Paint only the rows and columns intersecting the exposed rectangle.
+        area = event.rect() & self.contentsRect()
+        if area.isEmpty():
+            return
+        nrows, ncols = self.tiles.shape
+        top, left = self._cellIndex(area.topLeft())
+        bottom, right = self._cellIndex(area.bottomRight())
+
+        rows = range(max(bottom, 0), min(top, nrows - 1) + 1)
+        cols = range(max(left, 0), min(right, ncols - 1) + 1)
+        width, height = self.tilesize.width(), self.tilesize.height()
+        origin = self._cellRect((0, 0)).topLeft()
+        tiles = self.tiles.tolist()
+
+        painter = QPainter(self)
+        for row in rows:
+            y = origin.y() - row * height
+            for col in cols:
+                x = origin.x() + col * width
+                painter.drawPixmap(x, y, self.pixmaps[tiles[row][col]])
+
+    def sizeHint(self):
+        nrows, ncols = self.tiles.shape
+        frame = 2 * self.frameWidth()
+        return QSize(
+            ncols * self.tilesize.width() + frame,
+            nrows * self.tilesize.height() + frame,
+        )
+
+    def _cellRect(self, pos):
+        row, col = pos
+        area = self.contentsRect()
+        return QRect(
+            area.left() + col * self.tilesize.width(),
+            area.top() + (self.tiles.shape[0] - row - 1) * self.tilesize.height(),
+            self.tilesize.width(),
+            self.tilesize.height(),
+        )
+
+    def _cellIndex(self, point):
+        area = self.contentsRect()
+        row = (point.y() - area.top()) // self.tilesize.height()
+        col = (point.x() - area.left()) // self.tilesize.width()
+        return self.tiles.shape[0] - 1 - row, col
+
+    def _cellAt(self, point):
+        if not self.contentsRect().contains(point):
+            return None
+        row, col = self._cellIndex(point)
+        if not (0 <= row < self.tiles.shape[0] and 0 <= col < self.tiles.shape[1]):
+            return None
+        return row, col
@@ -0,0 +1,94 @@
+from collections import deque, namedtuple
+from enum import Enum, auto
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+from constants import POP_SPEED
+import time
+
+
+class SchedulerState(Enum):
+    IDLE = auto()  # the last frame is shown, ready for input
+    PLAYING = auto()  # frames are pending
+
+
+FrameMetrics = namedtuple("FrameMetrics", "frames, fps, mean_lag, max_lag")
+
+
+# Plays back a queue of frames at a fixed interval with a single timer, for
+# the lifetime of a game view. The first frame of a timeline is shown at once;
+# input should be ignored while the scheduler is playing (see isBusy). Timer
+# lag (how late each frame is shown) and frame rate are recorded across every
+# scheduler of the session (see frame_metrics).
+class FrameScheduler(QObject):
+    started = pyqtSignal()
+    finished = pyqtSignal()
+
+    def __init__(self, show, interval=POP_SPEED, parent=None):
+        super().__init__(parent)
+        self.show = show
+        self.interval = interval
+        self.state = SchedulerState.IDLE
+        self.frames = deque()
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(int(interval * 1000))
+        self.timer.timeout.connect(self._tick)
+
+    def isBusy(self):
+        return self.state is SchedulerState.PLAYING
+
+    def play(self, frames):
+        """Replace any pending frames with the given timeline and play it."""
+        self.frames.clear()
+        self.frames.extend(frames)
+        if self.frames:
+            self._next()
+
+        if self.frames and self.state is SchedulerState.IDLE:
+            self.state = SchedulerState.PLAYING
+            self._last = time.perf_counter()
+            self.timer.start()
+            self.started.emit()
+        elif not self.frames:
+            self._finish()
+
+    def skip(self):
+        """Jump straight to the last frame of the timeline being played."""
+        while len(self.frames) > 1:
+            self.frames.popleft()
+        if self.frames:
+            self._next()
+            self._finish()
+
+    def _tick(self):
+        now = time.perf_counter()
+        lag = max(now - self._last - self.interval, 0.0)
+        _frame_stats["frames"] += 1
+        _frame_stats["elapsed"] += now - self._last
+        _frame_stats["lag"] += lag
+        _frame_stats["max_lag"] = max(_frame_stats["max_lag"], lag)
+        self._last = now
+
+        self._next()
+        if not self.frames:
+            self._finish()
+
+    def _next(self):
+        self.show(self.frames.popleft())
+
+    def _finish(self):
+        self.timer.stop()
+        if self.state is SchedulerState.PLAYING:
+            self.state = SchedulerState.IDLE
+            self.finished.emit()
+
+
+def frame_metrics():
+    """Return the **FrameMetrics** of the frames played back by every timer."""
+    frames, elapsed = _frame_stats["frames"], _frame_stats["elapsed"]
+    fps = frames / elapsed if elapsed else 0.0
+    mean_lag = _frame_stats["lag"] / frames if frames else 0.0
+    return FrameMetrics(frames, fps, mean_lag, _frame_stats["max_lag"])
+
+
+_frame_stats = {"frames": 0, "elapsed": 0.0, "lag": 0.0, "max_lag": 0.0}
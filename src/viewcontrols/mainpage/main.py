@@ -10,21 +10,21 @@ from PyQt5.QtWidgets import (
     QSizePolicy,
     QPushButton,
 )
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import QTimer, pyqtSignal
 import os
-from viewcontrols.qtutils import ErrorPopup, deleteItemOfLayout
+from viewcontrols.qtutils import ErrorPopup, WindowRegistry, deleteItemOfLayout
 from viewcontrols.mainpage.module import NewModuleDialog, ViewModuleFormLayout
+from viewcontrols.mainpage.watcher import ModuleWatcher
 from viewcontrols.gamepage.editor import EditorVC
 from viewcontrols.gamepage.player import ReviewVC, TesterVC
-from models import PuzzleModule, Puzzle
-from constants import (
-    SKIN_DIRECTORY,
-    MODULE_DIRECTORY,
-    PUZZLE_FILE_ROOT,
-    PUZZLE_FILE_EXT,
-)
+from viewcontrols.gamepage.scheduler import frame_metrics
+from models import PuzzleModule, Puzzle, ModuleIndex
+from models.results import ResultsLog
+from constants import SKIN_DIRECTORY, MODULE_DIRECTORY, MEMORY_REFRESH
+from profiling import PhaseTimer, resident_memory
 from copy import deepcopy
 import threading
+import bisect
 
 
 def check_module(func):
@@ -51,8 +51,9 @@ class CompatThread(threading.Thread):
 
 
 class MainControl:
-    def __init__(self):
-        view = MainView()
+    def __init__(self, profiler=None):
+        profiler = PhaseTimer() if profiler is None else profiler
+        view = MainView(profiler)
         view.select_module.connect(self._load_module)
         view.new_module.connect(self._new_module)
         view.test_module.connect(self._test_module)
@@ -64,12 +65,34 @@ class MainControl:
         self.selfcompat_thread = CompatThread(None, lambda: None)
         view.closed.connect(lambda: self.selfcompat_thread.killme.set())
 
-        # New windows aren't garbage collected.
-        # So don't make thousands of windows?
-        self._garbage_pit = []
+        # Test attempts are logged in the background, and flushed on exit.
+        self.results = ResultsLog()
+        view.closed.connect(self.results.close)
+
+        self.watcher = ModuleWatcher()
+        self.watcher.changed.connect(self._reload_puzzles)
+
+        # Controllers of the open windows, released as their windows close.
+        self.windows = WindowRegistry(view)
+        self.windows.changed.connect(self._update_session_status)
+
+        self.memory_timer = QTimer(view)
+        self.memory_timer.setInterval(int(MEMORY_REFRESH * 1000))
+        self.memory_timer.timeout.connect(self._update_session_status)
+        self.memory_timer.start()
 
         self.view = view
+        self._update_session_status()
+        profiler.mark("controller setup")
+
+        # Showing the main window loads the selected module (if any).
         self.view.show()
+        profiler.mark("show and module load")
+
+    def _update_session_status(self):
+        self.view.setSessionStatus(
+            self.windows.counts(), resident_memory(), frame_metrics()
+        )
 
     def _load_module(self, module):
         if not module:
@@ -81,8 +104,27 @@ class MainControl:
                 ErrorPopup("Selected module could not be loaded.")
                 self.module = None
 
+        self.watcher.watch(module if self.module is not None else None)
         self.view.setModuleMetadata(self.module)
 
+    def _reload_puzzles(self, changed, removed):
+        if self.module is None:
+            return
+
+        invalid = self.module.reload_puzzles(self.view.module(), changed, removed)
+        added = {os.path.splitext(f)[0] for f in changed - invalid}
+        removed = {os.path.splitext(f)[0] for f in removed | invalid}
+        self.view.patchPuzzleSelector(added=added, removed=removed)
+
+        for tester in self.windows.controllers("test"):
+            if tester.module is self.module:
+                tester.updatePuzzles(added, removed)
+
+        if invalid:
+            self.view.statusBar().showMessage(
+                "Could not load: " + ", ".join(sorted(invalid)), 5000
+            )
+
     def _new_module(self):
         dialog = NewModuleDialog(parent=self.view,)
         dialog.show()
@@ -118,10 +160,17 @@ class MainControl:
             ErrorPopup("No skin is loaded.")
             return
 
-        tester = TesterVC(skin, deepcopy(self.module), movelen, fbdelay, self.view)
+        tester = TesterVC(
+            skin,
+            self.module,
+            self.view.module(),
+            movelen,
+            fbdelay,
+            self.view,
+            results=self.results,
+        )
         tester.win.setWindowTitle("Test (" + self.view.module() + ")")
-        self._garbage_pit.append(tester)
-        self._garbage_pit.append(tester.win)
+        self.windows.register("test", tester.win, tester)
 
     @check_module
     def _new_puzzle(self, skin):
@@ -131,9 +180,8 @@ class MainControl:
 
         puzzle = Puzzle.new(self.module, self.view.module())
         editor = EditorVC(puzzle, skin, self.view)
-
-        # The connection seems to prevent garbage collection also.
         editor.view.winclose.connect(self.view._updatePuzzleSelector)
+        self.windows.register("editor", editor.view, editor)
 
     @check_module
     def _review_puzzle(self, skin, puzzle):
@@ -147,9 +195,8 @@ class MainControl:
         puz = self.module.puzzles[puzzle]
         text = puz.path + "/" + puzzle
 
-        reviewer = ReviewVC(skin, deepcopy(puz), text, self.view)
-        self._garbage_pit.append(reviewer)
-        self._garbage_pit.append(reviewer.win)
+        reviewer = ReviewVC(skin, puz.session(), text, self.view)
+        self.windows.register("review", reviewer.win, reviewer)
 
         reviewer.win.setWindowTitle("Review Puzzle")
 
@@ -163,7 +210,7 @@ class MainView(QMainWindow):
     self_compat = pyqtSignal()
     closed = pyqtSignal()
 
-    def __init__(self, parent=None):
+    def __init__(self, profiler, parent=None):
         super().__init__(parent)
         self.setWindowTitle("PuyoTrainer v1.0.0")
 
@@ -172,11 +219,15 @@ class MainView(QMainWindow):
         self.layout = QVBoxLayout(main_widget)
 
         self._createStatusBar()
+        profiler.mark("status bar")
         self._createPuzzleSelector()
+        profiler.mark("module directory scan")
         self._hlineSeparator()
         self._createModuleControls()
         self._hlineSeparator()
+        profiler.mark("module controls")
         self._createSettingSelector()
+        profiler.mark("skin scan")
 
     def closeEvent(self, event):
         self.closed.emit()
@@ -221,8 +272,22 @@ class MainView(QMainWindow):
 
         status_bar.addWidget(QLabel("(keyboard usage: arrow keys, x, z, spacebar)"))
 
+        self.session_status = QLabel()
+        status_bar.addPermanentWidget(self.session_status)
+
         self.setStatusBar(status_bar)
 
+    def setSessionStatus(self, counts, memory, frames):
+        windows = ", ".join([str(n) + " " + kind for kind, n in sorted(counts.items())])
+        text = "open: " + (windows if windows else "none")
+        if memory is not None:
+            text += " (" + str(round(memory / 2 ** 20)) + " MB)"
+        if frames.frames:
+            text += " | {:.1f} fps, {:.1f} ms lag (max {:.1f} ms)".format(
+                frames.fps, frames.mean_lag * 1000, frames.max_lag * 1000
+            )
+        self.session_status.setText(text)
+
     def _hlineSeparator(self):
         hline = QFrame()
         hline.setFrameShape(QFrame.HLine)
@@ -333,16 +398,23 @@ class MainView(QMainWindow):
         if empty or self.module() is None:
             return
 
-        _, _, filenames = next(os.walk(MODULE_DIRECTORY + self.module()))
-        puzzle_files = [
-            filename
-            for filename in filenames
-            if filename.startswith(PUZZLE_FILE_ROOT)
-            and filename.endswith(PUZZLE_FILE_EXT)
-        ]
-        for filename in sorted(puzzle_files):
-            root, _ = os.path.splitext(filename)
-            self.puzzle_selector.addItem(root, userData=root)
+        for name in ModuleIndex.of(self.module()).names:
+            self.puzzle_selector.addItem(name, userData=name)
+
+    def patchPuzzleSelector(self, added, removed):
+        for name in removed:
+            index = self.puzzle_selector.findData(name)
+            if index >= 0:
+                self.puzzle_selector.removeItem(index)
+
+        selector = self.puzzle_selector
+        names = [selector.itemData(i) for i in range(selector.count())]
+        for name in sorted(added):
+            if selector.findData(name) >= 0:
+                continue
+            position = bisect.bisect(names, name)
+            names.insert(position, name)
+            selector.insertItem(position, name, userData=name)
 
     def _createModuleControls(self):
         new_module_button = QPushButton("New Module")
@@ -0,0 +1,67 @@
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from models import ModuleIndex
+from constants import WATCH_DEBOUNCE
+
+
+# Watches the puzzle files of a single module directory for changes made
+# outside of the application. Bursts of changes are debounced and reported
+# together as the sets of changed (added or modified) and removed file names.
+class ModuleWatcher(QObject):
+    changed = pyqtSignal(set, set)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.modulename = None
+        self.files = {}
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._debounce)
+        self.watcher.fileChanged.connect(self._debounce)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(WATCH_DEBOUNCE * 1000))
+        self.timer.timeout.connect(self._refresh)
+
+    def watch(self, modulename):
+        self.timer.stop()
+        paths = self.watcher.directories() + self.watcher.files()
+        if paths:
+            self.watcher.removePaths(paths)
+
+        self.modulename = modulename
+        self.files = {}
+        if modulename:
+            index = ModuleIndex.of(modulename)
+            self.files = dict(index.files)
+            self.watcher.addPath(index.path)
+            self._watchFiles(index)
+
+    def _debounce(self, _):
+        self.timer.start()
+
+    def _watchFiles(self, index):
+        # Files replaced on save (rather than rewritten) drop out of the watcher.
+        watched = set(self.watcher.files())
+        paths = [index.path + "/" + filename for filename in index.filenames]
+        paths = [path for path in paths if path not in watched]
+        if paths:
+            self.watcher.addPaths(paths)
+
+    def _refresh(self):
+        if not self.modulename:
+            return
+
+        # Compare against the files last seen here, since the shared index
+        # may have been rescanned elsewhere in the meantime.
+        index = ModuleIndex.of(self.modulename)
+        index.scan()
+        self._watchFiles(index)
+
+        files = index.files
+        changed = {f for f in files if files[f] != self.files.get(f)}
+        removed = set(self.files) - set(files)
+        self.files = dict(files)
+
+        if changed or removed:
+            self.changed.emit(changed, removed)
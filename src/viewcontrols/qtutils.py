@@ -1,4 +1,7 @@
 from PyQt5.QtWidgets import QMessageBox
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from PyQt5 import sip
+from collections import Counter
 
 
 def ErrorPopup(msg, parent=None):
@@ -20,3 +23,43 @@ def deleteItemOfLayout(layout, index):
         widget.deleteLater()
     else:
         deleteItemsOfLayout(item.layout())
+
+
+class WindowRegistry(QObject):
+    """
+    Keeps the controller of each open window alive for as long as the window
+    is open. Registered windows are deleted once closed, which drops their
+    controllers (and the puzzles and graphics they hold). Emits **changed**
+    whenever a window is registered or released.
+    """
+
+    changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._windows = {}
+
+    def register(self, kind, window, controller):
+        """Register an open window of the given kind (e.g. "test")."""
+        self._windows[sip.unwrapinstance(window)] = (kind, controller)
+        window.setAttribute(Qt.WA_DeleteOnClose)
+        window.destroyed.connect(self._release)
+        self.changed.emit()
+
+    def counts(self):
+        """collections.Counter: The number of open windows of each kind."""
+        return Counter([kind for kind, _ in self._windows.values()])
+
+    def controllers(self, kind):
+        """Return the controllers of the open windows of the given kind."""
+        return [ctrl for knd, ctrl in self._windows.values() if knd == kind]
+
+    def __len__(self):
+        return len(self._windows)
+
+    def _release(self, window):
+        # Windows are tracked by address, since the destroyed signal carries a
+        # new wrapper of the window. Connecting a bound method (rather than a
+        # lambda) also disconnects it should the registry be destroyed first.
+        if self._windows.pop(sip.unwrapinstance(window), None) is not None:
+            self.changed.emit()
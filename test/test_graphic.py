@@ -0,0 +1,83 @@
+from models.graphic import skin_atlas, skin_cache_info, skin_tiles, tile_id
+from models.graphic import grid2tiles, grid2graphics, ADJ_BITS
+from models import BoardGrid, Puyo, Direc, PopState
+from constants import SKIN_DIRECTORY
+from itertools import product
+import unittest
+import os
+
+
+class TestSkinAtlas(unittest.TestCase):
+    def test_cache(self):
+        atlas = skin_atlas("Aqua.png")
+        self.assertEqual(atlas.shape[2], 4)
+        self.assertFalse(atlas.flags.writeable)
+
+        # repeated loads are served from the cache
+        info = skin_cache_info()
+        self.assertIs(atlas, skin_atlas("Aqua.png"))
+        self.assertEqual(skin_cache_info().hits, info.hits + 1)
+        self.assertEqual(skin_cache_info().misses, info.misses)
+
+        # a modified skin file is reloaded
+        filepath = SKIN_DIRECTORY + "Aqua.png"
+        stat = os.stat(filepath)
+        os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        try:
+            self.assertIsNot(atlas, skin_atlas("Aqua.png"))
+            self.assertEqual(skin_cache_info().misses, info.misses + 1)
+        finally:
+            os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+class TestTiles(unittest.TestCase):
+    def test_tile_table(self):
+        keys = list(product(Puyo, range(16), (False, True), (False, True), PopState))
+        ids = [tile_id(*key) for key in keys]
+        self.assertEqual(sorted(ids), list(range(len(keys))))
+
+        table = skin_tiles("Aqua.png")
+        self.assertIs(table, skin_tiles("Aqua.png"))
+        self.assertEqual(table.images.shape[1:], (30, 30, 4))
+
+        # hidden tiles have their opacity baked in
+        shown = table.images[table.lut[tile_id(Puyo.RED)]]
+        hidden = table.images[table.lut[tile_id(Puyo.RED, hidden=True)]]
+        self.assertTrue(((shown[:, :, 3] // 2) - hidden[:, :, 3] <= 1).all())
+
+        # ghosts are padded with transparency
+        ghost = table.images[table.lut[tile_id(Puyo.RED, ghost=True)]]
+        self.assertTrue((ghost[:7, :, 3] == 0).all())
+
+    def test_grid2tiles(self):
+        board = BoardGrid.new(shape=(2, 3), nhide=1)
+        board[0, 0:2] = Puyo.RED
+        board[1, 0] = Puyo.RED
+        board[2, 0] = Puyo.RED
+        board[0, 2] = Puyo.GARBAGE
+
+        east, north = ADJ_BITS[Direc.EAST], ADJ_BITS[Direc.NORTH]
+        south, west = ADJ_BITS[Direc.SOUTH], ADJ_BITS[Direc.WEST]
+        ghost = BoardGrid.GridElem((1, 1), Puyo.BLUE)
+        popped = BoardGrid.GridElem((0, 2), Puyo.GARBAGE)
+        tiles = grid2tiles(board, {ghost}, {popped}, PopState.POPEARLY)
+
+        self.assertEqual(tiles[0, 0], tile_id(Puyo.RED, east | north))
+        self.assertEqual(tiles[0, 1], tile_id(Puyo.RED, west))
+        self.assertEqual(tiles[1, 0], tile_id(Puyo.RED, south))
+        self.assertEqual(tiles[2, 0], tile_id(Puyo.RED, hidden=True))
+        self.assertEqual(tiles[2, 1], tile_id(Puyo.NONE, hidden=True))
+        self.assertEqual(tiles[1, 1], tile_id(Puyo.BLUE, ghost=True))
+        self.assertEqual(tiles[0, 2], tile_id(Puyo.GARBAGE, popstate=PopState.POPEARLY))
+
+        # empty cells and garbage have the same tile whatever their neighbors
+        self.assertEqual(tiles[1, 2], tile_id(Puyo.NONE))
+        board[1, 2] = Puyo.GARBAGE
+        tiles = grid2tiles(board)
+        self.assertEqual(tiles[0, 2], tile_id(Puyo.GARBAGE))
+        self.assertEqual(tiles[1, 2], tile_id(Puyo.GARBAGE))
+
+        # graphics pair the skin with the (skin-independent) tile ids
+        graphics = grid2graphics("Aqua.png", board)
+        self.assertEqual(graphics.skin, "Aqua.png")
+        self.assertTrue((graphics.tiles == grid2tiles(board)).all())
@@ -268,6 +268,53 @@ class TestBoardGrid(unittest.TestCase):
         result[0:2, 2] = Puyo.RED
         self.assertEqual(board.apply_move(move), result)
 
+    def test_landing(self):
+        board = BoardGrid.new(shape=(3, 3), nhide=1)
+        board[0:3, 1] = Puyo.RED
+
+        for col, direc in [(0, Direc.EAST), (1, Direc.NORTH), (2, Direc.WEST)]:
+            move = Move(shape=(2, 1), col=col, direc=direc)
+            move.grid[0, 0] = Puyo.BLUE
+            move.grid[1, 0] = Puyo.GREEN
+
+            history = len(board._boardlist)
+            landing = board.landing(move)
+            self.assertEqual(len(board._boardlist), history)
+
+            before = BoardGrid.new(shape=(3, 3), nhide=1)
+            before[:] = board._board
+            self.assertEqual(landing, board.apply_move(move) - before)
+            board.revert_move()
+
+    def test_view(self):
+        board = BoardGrid.new(shape=(3, 3), nhide=1)
+        move = Move(shape=(2, 1), col=0, direc=Direc.NORTH)
+        move.grid[:] = Puyo.RED
+        board.apply_move(move)
+
+        # views share elements until written, by either grid
+        view = board.view()
+        self.assertIs(view._board, board._board)
+        view[0, 1] = Puyo.BLUE
+        self.assertIsNot(view._board, board._board)
+        self.assertIs(board[0, 1], Puyo.NONE)
+        board[0, 2] = Puyo.GREEN
+        self.assertIs(view[0, 2], Puyo.NONE)
+
+        # the move history is shared but reverted independently
+        view.revert()
+        self.assertIs(view[0, 0], Puyo.NONE)
+        self.assertIs(board[0, 0], Puyo.RED)
+        board.revert_move()
+        board[0, 0] = Puyo.BLUE
+        self.assertIs(view[0, 0], Puyo.NONE)
+
+        moveview = move.view()
+        moveview.col = 1
+        moveview.grid[0, 0] = Puyo.BLUE
+        self.assertEqual(move.col, 0)
+        self.assertIs(move.grid[0, 0], Puyo.RED)
+
     def test_simple_pop(self):
         board = BoardGrid.new(shape=(2, 2), nhide=1)
         board[0, 0] = Puyo.RED
@@ -335,3 +382,43 @@ class TestBoardGrid(unittest.TestCase):
         }
         result = board.pop_set(4)
         self.assertEqual(predict, result)
+
+    def test_resolve_chain(self):
+        board = BoardGrid.new(shape=(4, 2), nhide=1)
+        board[0:2, 0] = Puyo.RED
+        board[2, 0] = Puyo.BLUE
+        board[0, 1] = Puyo.BLUE
+
+        steps = board.resolve_chain(2)
+        self.assertEqual(len(steps), 2)
+        self.assertEqual(steps[0].pops, {((0, 0), Puyo.RED), ((1, 0), Puyo.RED)})
+        self.assertEqual(steps[1].pops, {((0, 0), Puyo.BLUE), ((0, 1), Puyo.BLUE)})
+        self.assertIs(steps[1].grid[0, 0], Puyo.BLUE)
+        self.assertEqual(board, BoardGrid.new(shape=(4, 2), nhide=1))
+        self.assertEqual(board.resolve_chain(2), [])
+
+    def test_replay(self):
+        board = BoardGrid.new(shape=(4, 2), nhide=1)
+        board[0:2, 0] = Puyo.BLUE
+        moves = []
+        for col, puyo in [(1, Puyo.RED), (0, Puyo.BLUE)]:
+            move = Move(shape=(2, 1), col=col, direc=Direc.NORTH)
+            move.grid[:] = puyo
+            moves.append(move)
+
+        # replayed from the initial board, which is unchanged
+        board.apply_move(moves[0])
+        states = board.replay(moves, 3)
+        self.assertEqual(len(states), 3)
+        self.assertIs(board[0, 1], Puyo.RED)
+        self.assertIs(states[0][0, 1], Puyo.NONE)
+        self.assertIs(states[1][1, 1], Puyo.RED)
+        self.assertIs(states[2][0, 0], Puyo.NONE)
+        self.assertIs(states[2][1, 1], Puyo.RED)
+
+        # restored boards step back through the replayed states
+        board.restore(states, 2)
+        self.assertEqual(board.revert_move(), states[1])
+        board[0, 0] = Puyo.GREEN
+        self.assertIs(states[1][0, 0], Puyo.BLUE)
+        self.assertEqual(board.revert_move(), states[0])
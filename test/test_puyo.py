@@ -33,3 +33,23 @@ class TestEnums(unittest.TestCase):
         self.assertEqual(Direc.SOUTH, Direc.adj_direc((1, 1), (0, 1)))
         self.assertEqual(Direc.WEST, Direc.adj_direc((1, 1), (1, 0)))
         self.assertEqual(None, Direc.adj_direc((1, 1), (2, 2)))
+
+    def test_color_maps(self):
+        table = Puyo.color_maps()
+        self.assertEqual(table.shape[0], 120)
+        self.assertIs(table, Puyo.color_maps())
+
+        # every row permutes the colors only, starting from the identity
+        colors = {puyo for puyo in Puyo if Puyo.is_color(puyo)}
+        for row in table:
+            self.assertEqual({row[puyo.value] for puyo in colors}, colors)
+            self.assertIs(row[Puyo.NONE.value], Puyo.NONE)
+            self.assertIs(row[Puyo.GARBAGE.value], Puyo.GARBAGE)
+        self.assertEqual([table[0, puyo.value] for puyo in Puyo], list(Puyo))
+
+        # composition
+        self.assertEqual(Puyo.compose_color_maps(0, 7), 7)
+        composed = Puyo.compose_color_maps(5, 9)
+        for puyo in Puyo:
+            permuted = table[5, puyo.value]
+            self.assertIs(table[composed, puyo.value], table[9, permuted.value])
@@ -1,6 +1,13 @@
-from models import PuzzleModule, Puzzle, Puyo, Direc
+from models import PuzzleModule, Puzzle, Puyo, Direc, RuleEvaluator
+from models import Violation, check_puzzle, check_puzzles, ModuleIndex
+from models.validation import ValidationIndex, digest
+from models.rules import RULES_VERSION
+from unittest import mock
+import statistics
 import unittest
 import shutil
+import time
+import os
 
 
 def buildup_teardown():
@@ -67,3 +74,295 @@ class TestPuzzleModuleRules(unittest.TestCase):
         self.assertFalse(module._rule_move_fits_horizontally(puzzle, force=False))
         self.assertTrue(module._rule_move_fits_horizontally(puzzle, force=True))
         self.assertTrue(module._rule_move_fits_horizontally(puzzle, force=False))
+
+
+class TestValidationIndex(unittest.TestCase):
+    @buildup_teardown()
+    def test_cached_results(self, module, puzzle):
+        puzzle.moves[0].grid[:] = Puyo.RED
+        puzzle.board.apply_move(puzzle.moves[0])
+        puzzle.save()
+
+        # the saved puzzle is recorded as valid and survives a reload
+        module = PuzzleModule.load("unittest")
+        with open("./modules/unittest/puzzle_1.yml", "r") as infile:
+            text = infile.read()
+        self.assertTrue(module.validation.lookup("puzzle_1.yml", digest(text)))
+        self.assertEqual(module.puzzle_digest("puzzle_1"), digest(text))
+
+        # any edit to the puzzle file misses the cache
+        self.assertIsNone(module.validation.lookup("puzzle_1.yml", digest(text + " ")))
+
+        # any change to the metadata discards every record
+        with open("./modules/unittest/metadata.yml", "r") as infile:
+            metadata_text = infile.read()
+        index = ValidationIndex.load("unittest", metadata_text, module.rules)
+        self.assertTrue(index.lookup("puzzle_1.yml", digest(text)))
+        index = ValidationIndex.load("unittest", metadata_text + " ", module.rules)
+        self.assertIsNone(index.lookup("puzzle_1.yml", digest(text)))
+
+        # as does any change to the rules
+        with mock.patch("models.validation.RULES_VERSION", RULES_VERSION + 1):
+            index = ValidationIndex.load("unittest", metadata_text, module.rules)
+        self.assertIsNone(index.lookup("puzzle_1.yml", digest(text)))
+
+        # an unreadable index is rebuilt
+        with open("./modules/unittest/validation.db", "w") as outfile:
+            outfile.write("garbage")
+        module = PuzzleModule.load("unittest")
+        self.assertTrue(module.validation.lookup("puzzle_1.yml", digest(text)))
+        module.validation.record("puzzle_2.yml", digest(text), True)
+        module.validation.save()
+        index = ValidationIndex.load("unittest", metadata_text, module.rules)
+        self.assertTrue(index.lookup("puzzle_1.yml", digest(text)))
+        self.assertTrue(index.lookup("puzzle_2.yml", digest(text)))
+
+    @buildup_teardown()
+    def test_save_cost(self, module, puzzle):
+        puzzle.moves[0].grid[:] = Puyo.RED
+        puzzle.board.apply_move(puzzle.moves[0])
+
+        def save_time():
+            times = []
+            for _ in range(15):
+                start = time.perf_counter()
+                puzzle.save()
+                times.append(time.perf_counter() - start)
+            return statistics.median(times)
+
+        small = save_time()
+
+        # fill the module with puzzle files (and their validation records)
+        with open("./modules/unittest/puzzle_1.yml", "r") as infile:
+            text = infile.read()
+        for idx in range(100, 2100):
+            filename = "puzzle_" + str(idx) + ".yml"
+            with open("./modules/unittest/" + filename, "w") as outfile:
+                outfile.write(text)
+            module.validation.record(filename, digest(text), True)
+        module.validation.save()
+        puzzle.save()
+
+        # saving a puzzle costs the same however large the module is
+        large = save_time()
+        self.assertLess(large, 2 * small + 0.002)
+
+    @buildup_teardown()
+    def test_save_invalid(self, module, puzzle):
+        puzzle.moves[0].grid[:] = Puyo.RED
+        puzzle.board[0, 0:3] = Puyo.RED
+        puzzle.board[1, 2] = Puyo.RED
+        puzzle.board.apply_move(puzzle.moves[0])
+        puzzle.save()
+
+        # a puzzle saved in breach of the rules is recorded as invalid
+        with open("./modules/unittest/puzzle_1.yml", "r") as infile:
+            text = infile.read()
+        self.assertFalse(module.validation.lookup("puzzle_1.yml", digest(text)))
+        self.assertNotIn("puzzle_1", module.puzzles)
+
+    @buildup_teardown()
+    def test_session(self, module, puzzle):
+        puzzle.moves[0].grid[:] = Puyo.RED
+        puzzle.save()
+        saved = module.puzzles["puzzle_1"]
+        self.assertIs(saved.module, module)
+
+        # sessions are played independently of the saved puzzle
+        session = saved.session()
+        session.board.apply_move(session.moves[0])
+        session.moves[0].col = 0
+        session.randomize_color()
+        self.assertEqual(saved.board, puzzle.board)
+        self.assertEqual(saved.moves[0].col, 2)
+        self.assertIs(saved.moves[0].grid[0, 0], Puyo.RED)
+
+    @buildup_teardown()
+    def test_trim_moves(self, module, puzzle):
+        puzzle.board[0, 0:3] = Puyo.RED
+        puzzle.moves[0].grid[:] = Puyo.RED
+        puzzle.moves[0].col = 3
+        puzzle.new_move(1).grid[:] = Puyo.BLUE
+        puzzle.new_move(2).grid[:] = Puyo.GREEN
+        puzzle.moves[1].col = 0
+        solution = puzzle.session()
+
+        # the skipped move pops before the next move lands
+        steps = puzzle.trim_moves(2)
+        self.assertEqual(len(steps), 1)
+        self.assertEqual(len(puzzle.moves), 2)
+        self.assertEqual(puzzle.board._boardlist, [])
+        self.assertIs(puzzle.board[0, 0], Puyo.NONE)
+        puzzle.board.apply_move(puzzle.moves[0])
+        self.assertIs(puzzle.board[0, 0], Puyo.BLUE)
+
+        # and the board matches the solution replayed to the same move
+        states = solution.board.replay(solution.moves, module.pop_limit)
+        puzzle.board.revert()
+        self.assertEqual(puzzle.board, states[1])
+
+    @buildup_teardown()
+    def test_apply_color_map(self, module, puzzle):
+        table = Puyo.color_maps()
+        puzzle.board[0, 0:2] = [Puyo.RED, Puyo.GARBAGE]
+        puzzle.moves[0].grid[:] = Puyo.BLUE
+
+        puzzle.apply_color_map(3)
+        self.assertIs(puzzle.board[0, 0], table[3, Puyo.RED.value])
+        self.assertIs(puzzle.board[0, 1], Puyo.GARBAGE)
+        self.assertIs(puzzle.board[1, 0], Puyo.NONE)
+        self.assertIs(puzzle.moves[0].grid[1, 0], table[3, Puyo.BLUE.value])
+        self.assertEqual(puzzle.cmap, 3)
+
+        puzzle.apply_color_map(11)
+        self.assertEqual(puzzle.cmap, Puyo.compose_color_maps(3, 11))
+        self.assertIs(puzzle.board[0, 0], table[puzzle.cmap, Puyo.RED.value])
+
+
+class TestRuleEvaluator(unittest.TestCase):
+    @buildup_teardown()
+    def test_board_edits(self, module, puzzle):
+        evaluator = RuleEvaluator(puzzle)
+        self.assertTrue(evaluator.evaluate())
+
+        # a floating puyo
+        puzzle.board[1, 0] = Puyo.RED
+        evaluator.mark_board((1, 0))
+        self.assertFalse(evaluator.evaluate())
+
+        puzzle.board[0, 0] = Puyo.RED
+        evaluator.mark_board((0, 0))
+        self.assertTrue(evaluator.evaluate())
+
+        # a pop group
+        puzzle.board[0, 1:3] = Puyo.RED
+        evaluator.mark_board((0, 1))
+        evaluator.mark_board((0, 2))
+        self.assertFalse(evaluator.evaluate())
+        self.assertEqual(evaluator.evaluate(), puzzle.apply_rules())
+
+        puzzle.board[0, 2] = Puyo.BLUE
+        evaluator.mark_board((0, 2))
+        self.assertTrue(evaluator.evaluate())
+        self.assertEqual(evaluator.evaluate(), puzzle.apply_rules())
+
+    @buildup_teardown()
+    def test_drawpile_edits(self, module, puzzle):
+        evaluator = RuleEvaluator(puzzle)
+
+        puzzle.new_move(1)
+        evaluator.insert_move(1)
+        self.assertFalse(evaluator.evaluate())
+        self.assertTrue(evaluator.evaluate(force=True))
+        self.assertTrue(puzzle.apply_rules())
+
+        puzzle.moves[1].grid[:] = Puyo.GARBAGE
+        evaluator.mark_move(1)
+        self.assertFalse(evaluator.evaluate())
+        self.assertTrue(evaluator.evaluate(force=True))
+        self.assertTrue(puzzle.apply_rules())
+
+        puzzle.moves.clear()
+        evaluator.mark_drawpile()
+        self.assertFalse(evaluator.evaluate())
+        self.assertTrue(evaluator.evaluate(force=True))
+        self.assertEqual(len(puzzle.moves), 1)
+        self.assertTrue(puzzle.apply_rules())
+
+
+class TestCheckPuzzles(unittest.TestCase):
+    @buildup_teardown()
+    def test_violations(self, module, puzzle):
+        self.assertEqual(check_puzzle(puzzle), Violation.NONE)
+
+        floating = Puzzle.new(module, "unittest")
+        floating.board[1, 0] = Puyo.RED
+
+        popping = Puzzle.new(module, "unittest")
+        popping.board[0, 0:3] = Puyo.RED
+        popping.board[1, 2] = Puyo.RED
+
+        hidden = Puzzle.new(module, "unittest")
+        hidden.board[0:12, 0] = [Puyo.RED, Puyo.BLUE] * 6
+        hidden.board[9:13, 1] = Puyo.GREEN
+        hidden.board[0:9, 1] = [Puyo.YELLOW, Puyo.BLUE, Puyo.YELLOW] * 3
+
+        moves = Puzzle.new(module, "unittest")
+        moves.moves[0].grid[1, 0] = Puyo.GARBAGE
+        moves.moves[0].col = 6
+        moves.moves[0].direc = Direc.EAST
+
+        colors = Puzzle.new(module, "unittest")
+        colors.board[0, 0:4] = [Puyo.RED, Puyo.GREEN, Puyo.BLUE, Puyo.YELLOW]
+        colors.moves[0].grid[0, 0] = Puyo.PURPLE
+
+        empty = Puzzle.new(module, "unittest")
+        empty.moves = []
+
+        puzzles = [puzzle, floating, popping, hidden, moves, colors, empty]
+        predict = [
+            Violation.NONE,
+            Violation.FLOATING,
+            Violation.POP_GROUP,
+            Violation.NONE,
+            Violation.MOVE_GARBAGE | Violation.MOVE_SIZE | Violation.MOVE_FIT,
+            Violation.COLOR_LIMIT,
+            Violation.NO_MOVES,
+        ]
+        result = check_puzzles(module, puzzles)
+        self.assertEqual(predict, result)
+        for puz, violation in zip(puzzles, result):
+            self.assertEqual(puz.apply_rules(), not violation)
+
+
+class TestModuleIndex(unittest.TestCase):
+    @buildup_teardown()
+    def test_index(self, module, puzzle):
+        index = ModuleIndex.of("unittest")
+        self.assertEqual(index.names, [])
+        self.assertEqual(index.next_name(), "puzzle_1.yml")
+
+        for _ in range(3):
+            puzzle.save()
+        self.assertIs(index, ModuleIndex.of("unittest"))
+        self.assertEqual(index.names, ["puzzle_1", "puzzle_2", "puzzle_3"])
+        self.assertEqual(index.next_name(), "puzzle_4.yml")
+
+        # files removed and modified by hand are found by a rescan
+        os.remove("./modules/unittest/puzzle_2.yml")
+        with open("./modules/unittest/puzzle_3.yml", "a") as outfile:
+            outfile.write("\n")
+        added, removed, modified = index.scan()
+        self.assertEqual(added, set())
+        self.assertEqual(removed, {"puzzle_2.yml"})
+        self.assertEqual(modified, {"puzzle_3.yml"})
+        self.assertEqual(index.next_name(), "puzzle_2.yml")
+
+        puzzle.save()
+        self.assertEqual(index.names, ["puzzle_1", "puzzle_2", "puzzle_3"])
+        self.assertEqual(index.next_name(), "puzzle_4.yml")
+
+    @buildup_teardown()
+    def test_reload_puzzles(self, module, puzzle):
+        for _ in range(2):
+            puzzle.save()
+        module = PuzzleModule.load("unittest")
+
+        shutil.copy(
+            "./modules/unittest/puzzle_1.yml", "./modules/unittest/puzzle_3.yml"
+        )
+        os.remove("./modules/unittest/puzzle_1.yml")
+        with open("./modules/unittest/puzzle_2.yml", "a") as outfile:
+            outfile.write("moves: []\n")
+
+        changed, removed = {"puzzle_2.yml", "puzzle_3.yml"}, {"puzzle_1.yml"}
+        invalid = module.reload_puzzles("unittest", changed, removed)
+        self.assertEqual(invalid, {"puzzle_2.yml"})
+        self.assertEqual(set(module.puzzles), {"puzzle_3"})
+
+        # a full load fails on the invalid puzzle, unless it may be skipped
+        with self.assertRaises(AssertionError):
+            PuzzleModule.load("unittest")
+        module, invalid = PuzzleModule.load_partial("unittest")
+        self.assertEqual(invalid, {"puzzle_2.yml"})
+        self.assertEqual(set(module.puzzles), {"puzzle_3"})
@@ -0,0 +1,58 @@
+from models import PuzzleModule, Puzzle, Puyo, Move, Direc, PopState
+from models.graphic import skin_tiles, tile_id
+from models.render import solution_frames, replay_frames, frame2image, tiles2image
+import unittest
+
+
+def chain_puzzle():
+    module = PuzzleModule((4, 3), 1, (2, 1), 4, 2, "")
+    module._specify_rules()
+    puzzle = Puzzle.new(module, "unittest")
+    puzzle.board[0, 0] = Puyo.BLUE
+    puzzle.board[0, 1] = Puyo.RED
+
+    move = Move(shape=(2, 1), col=1, direc=Direc.NORTH)
+    move.grid[0, 0] = Puyo.RED
+    move.grid[1, 0] = Puyo.BLUE
+    puzzle.moves = [move]
+
+    return puzzle
+
+
+class TestRender(unittest.TestCase):
+    def test_solution_frames(self):
+        puzzle = chain_puzzle()
+        timeline = solution_frames(puzzle)
+
+        # the initial board, then two chain steps and the settled board
+        self.assertEqual([len(frames) for frames in timeline], [1, 7])
+        start, popped = timeline[0][0], timeline[1][1]
+        self.assertEqual(start.board[1, 1], tile_id(Puyo.RED, ghost=True))
+        self.assertEqual(start.nremaining, 1)
+        popearly = tile_id(Puyo.RED, popstate=PopState.POPEARLY)
+        self.assertEqual(popped.board[0, 1], popearly)
+        self.assertEqual(timeline[1][-1].nremaining, 0)
+        self.assertEqual(puzzle.board[0, 0], Puyo.NONE)
+
+    def test_replay_frames(self):
+        puzzle = chain_puzzle()
+        states, frames = replay_frames(puzzle)
+
+        # the resting frames match those of the (animated) solution
+        timeline = solution_frames(chain_puzzle())
+        self.assertEqual(len(states), len(timeline))
+        for frame, frames_of_move in zip(frames, timeline):
+            self.assertTrue((frame.board == frames_of_move[-1].board).all())
+            self.assertEqual(frame.nremaining, frames_of_move[-1].nremaining)
+        self.assertIs(puzzle.board[0, 0], Puyo.BLUE)
+
+    def test_frame2image(self):
+        table = skin_tiles("Aqua.png")
+        frame = solution_frames(chain_puzzle())[0][0]
+
+        board = tiles2image(table, frame.board)
+        self.assertEqual(board.shape, (5 * 30, 3 * 30, 4))
+
+        image = frame2image(table, frame)
+        self.assertEqual(image.shape[2], 3)
+        self.assertGreater(image.shape[0], board.shape[0])
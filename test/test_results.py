@@ -0,0 +1,113 @@
+from models import PuzzleModule, Puzzle, Puyo, Move, Direc
+from models.results import Attempt, ResultsLog, grade
+import unittest
+import sqlite3
+import tempfile
+import shutil
+import os
+
+
+class TestResults(unittest.TestCase):
+    def test_grade(self):
+        module = PuzzleModule((4, 3), 1, (2, 1), 4, 2, "")
+        module._specify_rules()
+        solution = Puzzle.new(module, "unittest")
+        solution.moves = []
+        for col in range(2):
+            move = Move(shape=(2, 1), col=col, direc=Direc.NORTH)
+            move.grid[0, 0] = Puyo.RED
+            move.grid[1, 0] = Puyo.BLUE
+            solution.moves.append(move)
+
+        response = solution.session()
+        self.assertEqual(grade(response, solution), (True, None))
+
+        response.moves[1].col = 2
+        self.assertEqual(grade(response, solution), (False, 1))
+
+        # a rotationally equivalent move is not wrong
+        response = solution.session()
+        response.moves[0].direc = Direc.SOUTH
+        response.moves[0].grid[0, 0] = Puyo.BLUE
+        response.moves[0].grid[1, 0] = Puyo.RED
+        self.assertEqual(grade(response, solution), (True, None))
+
+    def test_log(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            log = ResultsLog(os.path.join(tmpdir, "results.db"))
+            log.record(Attempt("module", "puzzle_1", "a", 3, 2, [1.0, 2.0], True, None))
+            log.record(Attempt("module", "puzzle_1", "a", 0, 2, [2.0, 3.0], False, 1))
+            log.record(Attempt("module", "puzzle_2", "b", 0, 1, [1.5], True, None))
+            log.record(Attempt("other", "puzzle_1", "a", 0, 1, [1.0], True, None))
+            log.flush()
+
+            stats = log.stats("module")
+            self.assertEqual(set(stats), {"a", "b"})
+            self.assertEqual(stats["a"].attempts, 2)
+            self.assertEqual(stats["a"].correct, 1)
+            self.assertAlmostEqual(stats["a"].mean_time, 4.0)
+            self.assertFalse(stats["a"].last_correct)
+            self.assertTrue(stats["b"].last_correct)
+
+            attempts = log.attempts("module", "a")
+            self.assertEqual([a.cmap for a in attempts], [3, 0])
+            self.assertEqual(list(attempts[1].timings), [2.0, 3.0])
+            self.assertEqual(attempts[1].first_wrong, 1)
+            self.assertFalse(attempts[1].correct)
+            self.assertEqual(attempts[1].puzzle, "puzzle_1")
+
+            # later logs append to the same file
+            log.close()
+            log = ResultsLog(os.path.join(tmpdir, "results.db"))
+            log.record(Attempt("module", "puzzle_2", "b", 0, 1, [0.5], False, 0))
+
+            # a reused name starts afresh
+            log.record(Attempt("module", "puzzle_1", "c", 0, 1, [0.5], True, None))
+            log.close()
+            stats = log.stats("module")
+            self.assertEqual(stats["b"].attempts, 2)
+            self.assertEqual(stats["a"].attempts, 2)
+            self.assertEqual(stats["c"].attempts, 1)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_log_without_digest(self):
+        tmpdir = tempfile.mkdtemp()
+        filepath = os.path.join(tmpdir, "results.db")
+        try:
+            # a log written before the content hash was kept
+            db = sqlite3.connect(filepath)
+            with db:
+                db.execute(
+                    """
+                    CREATE TABLE attempts (
+                        id INTEGER PRIMARY KEY,
+                        time REAL NOT NULL,
+                        module TEXT NOT NULL,
+                        puzzle TEXT NOT NULL,
+                        cmap INTEGER NOT NULL,
+                        nmoves INTEGER NOT NULL,
+                        duration REAL NOT NULL,
+                        timings BLOB NOT NULL,
+                        correct INTEGER NOT NULL,
+                        first_wrong INTEGER
+                    )
+                    """
+                )
+                db.execute(
+                    "INSERT INTO attempts VALUES (NULL, 0, 'module', 'puzzle_1', 0, 1, "
+                    "1.0, ?, 0, 0)",
+                    (bytes(4),),
+                )
+            db.close()
+
+            # its attempts cannot be told apart from those of a reused name
+            log = ResultsLog(filepath)
+            log.record(Attempt("module", "puzzle_1", "a", 0, 1, [0.5], True, None))
+            log.close()
+            stats = log.stats("module")
+            self.assertEqual(set(stats), {"a"})
+            self.assertEqual(stats["a"].attempts, 1)
+        finally:
+            shutil.rmtree(tmpdir)
@@ -0,0 +1,94 @@
+from models.results import Attempt, PuzzleStats
+from models.sampler import PuzzleSampler, attempt_weight
+from collections import Counter
+import unittest
+import random
+
+
+class TestSampler(unittest.TestCase):
+    def test_weight(self):
+        self.assertEqual(attempt_weight(None), 1.0)
+        solved = PuzzleStats(4, 4, 1.0, 0.0, True)
+        failed = PuzzleStats(4, 2, 1.0, 0.0, False)
+        recovered = PuzzleStats(4, 2, 1.0, 0.0, True)
+        self.assertEqual(attempt_weight(solved), 1.0)
+        self.assertGreater(attempt_weight(failed), attempt_weight(recovered))
+        self.assertGreater(attempt_weight(recovered), attempt_weight(solved))
+
+    def test_sample(self):
+        stats = {"b": PuzzleStats(1, 0, 1.0, 0.0, False)}
+        puzzles = {"puzzle_1": "a", "puzzle_2": "b", "puzzle_3": "c"}
+        sampler = PuzzleSampler(puzzles, stats)
+        rng = random.Random(0)
+        counts = Counter([sampler.sample(rng) for _ in range(6000)])
+
+        # the failed puzzle is drawn in proportion to its weight (5 of 7)
+        self.assertEqual(set(counts), {"puzzle_1", "puzzle_2", "puzzle_3"})
+        self.assertAlmostEqual(counts["puzzle_2"] / 6000, 5 / 7, delta=0.03)
+
+        # solving it halves its failure rate and drops the bonus for a last
+        # failure, so it is drawn twice as often as the others (1 + 2 * 0.5)
+        sampler.record(Attempt("module", "puzzle_2", "b", 0, 1, [1.0], True, None))
+        self.assertEqual(sampler.weight("puzzle_2"), 2.0)
+        self.assertEqual(sampler.stats["b"].attempts, 2)
+
+        # a name reused by another puzzle does not inherit its stats, and
+        # an attempt at the old puzzle leaves the new one be
+        sampler.add("puzzle_2", "d")
+        self.assertEqual(sampler.weight("puzzle_2"), 1.0)
+        sampler.record(Attempt("module", "puzzle_2", "b", 0, 1, [1.0], False, 0))
+        self.assertEqual(sampler.weight("puzzle_2"), 1.0)
+        self.assertEqual(sampler.stats["b"].attempts, 3)
+
+        # nor does a puzzle lose its stats when renamed
+        sampler.remove("puzzle_2")
+        sampler.add("puzzle_4", "b")
+        self.assertGreater(sampler.weight("puzzle_4"), 1.0)
+        self.assertTreeConsistent(sampler)
+
+    def assertTreeConsistent(self, sampler):
+        # every prefix sum of the tree matches the slot weights
+        for count in range(len(sampler._weights) + 1):
+            self.assertAlmostEqual(
+                sampler._prefix(count), sum(sampler._weights[:count])
+            )
+
+    def test_add_remove(self):
+        names = ["puzzle_" + str(idx) for idx in range(37)]
+        failed = PuzzleStats(1, 0, 1.0, 0.0, False)
+        stats = {name + ".hash": failed for name in names[::3] + ["puzzle_new"]}
+
+        sampler = PuzzleSampler({}, stats)
+        with self.assertRaises(IndexError):
+            sampler.sample()
+
+        for name in names:
+            sampler.add(name, name + ".hash")
+        sampler.add("puzzle_0", "puzzle_0.hash")
+        self.assertEqual(len(sampler), 37)
+        self.assertTreeConsistent(sampler)
+
+        for name in names[:30]:
+            sampler.remove(name)
+        rng = random.Random(0)
+        self.assertEqual({sampler.sample(rng) for _ in range(500)}, set(names[30:]))
+
+        # removed slots are reused, and each puzzle is drawn with the same
+        # probability as from a sampler built afresh
+        sampler.add("puzzle_new", "puzzle_new.hash")
+        self.assertIn("puzzle_new", sampler)
+        self.assertEqual(len(sampler._weights), 37)
+        self.assertTreeConsistent(sampler)
+
+        remaining = names[30:] + ["puzzle_new"]
+        rebuilt = PuzzleSampler({name: name + ".hash" for name in remaining}, stats)
+        self.assertTreeConsistent(rebuilt)
+        total = sampler._prefix(len(sampler._weights))
+        self.assertAlmostEqual(total, rebuilt._prefix(len(rebuilt._weights)))
+        for name in remaining:
+            self.assertEqual(sampler.weight(name), rebuilt.weight(name))
+
+        for name in remaining:
+            sampler.remove(name)
+        with self.assertRaises(IndexError):
+            sampler.sample()
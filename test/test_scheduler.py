@@ -0,0 +1,32 @@
+from PyQt5.QtCore import QCoreApplication
+from viewcontrols.gamepage.scheduler import FrameScheduler, frame_metrics
+import unittest
+
+
+class TestScheduler(unittest.TestCase):
+    def test_playback(self):
+        app = QCoreApplication.instance() or QCoreApplication([])
+        shown = []
+        scheduler = FrameScheduler(shown.append, interval=0.01)
+        scheduler.finished.connect(app.quit)
+        before = frame_metrics()
+
+        # the first frame is shown at once, the rest by the timer
+        scheduler.play(range(5))
+        self.assertEqual(shown, [0])
+        self.assertTrue(scheduler.isBusy())
+        app.exec_()
+        self.assertEqual(shown, list(range(5)))
+        self.assertFalse(scheduler.isBusy())
+
+        # the timer ticks are recorded in the session metrics
+        after = frame_metrics()
+        self.assertEqual(after.frames, before.frames + 4)
+        self.assertGreater(after.fps, 0.0)
+        self.assertGreaterEqual(after.max_lag, after.mean_lag)
+
+        # skipping shows the last frame at once
+        scheduler.play(range(5, 10))
+        scheduler.skip()
+        self.assertEqual(shown[-2:], [5, 9])
+        self.assertFalse(scheduler.isBusy())